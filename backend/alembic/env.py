@@ -9,14 +9,15 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-# Add the backend/app directory to the Python path
+# Add the backend directory to the Python path so the app package imports
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-APP_DIR = os.path.join(BASE_DIR, 'app')
-if APP_DIR not in sys.path:
-    sys.path.append(APP_DIR)
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
 
-# Import models Base from the new app structure
-from db import Base  # noqa: E402
+# Alembic owns the schema: the app no longer creates tables at startup.
+# Importing the models registers every table on Base.metadata for autogenerate.
+from app import models  # noqa: E402,F401
+from app.db import Base  # noqa: E402
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
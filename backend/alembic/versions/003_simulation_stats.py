@@ -0,0 +1,46 @@
+"""Add per-user simulation statistics rollup
+
+Revision ID: 003
+Revises: 002
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "003"
+down_revision = "002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "simulation_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("simulation_count", sa.Integer(), nullable=False),
+        sa.Column("total_property_value", sa.Float(), nullable=False),
+        sa.Column("total_down_payment_percentage", sa.Float(), nullable=False),
+        sa.Column("total_contract_years", sa.Integer(), nullable=False),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # Left empty: rows are only kept up to date while SIMULATION_STATS_ROLLUP is
+    # on, which seeds each user on their next write. Seeding here would go stale
+    # with the flag off; scripts/rebuild_simulation_stats.py rebuilds them all.
+
+
+def downgrade() -> None:
+    op.drop_table("simulation_stats")
@@ -0,0 +1,32 @@
+"""Index simulations for per-user keyset listing
+
+Revision ID: 004
+Revises: 003
+Create Date: 2024-01-01 00:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "004"
+down_revision = "003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build without blocking writes on an already populated table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_simulations_user_id_created_at_id",
+            "simulations",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_simulations_user_id_created_at_id", table_name="simulations")
@@ -0,0 +1,154 @@
+"""Hash-partition simulations by user_id and add simulations_archive
+
+Revision ID: 005
+Revises: 004
+Create Date: 2024-01-01 00:00:00.000000
+
+Every per-user query names user_id, so PostgreSQL prunes it to one of
+SIMULATION_PARTITIONS partitions (default 16), each with its own small
+indexes. The primary key becomes (id, user_id), as a partitioned table's key
+must include the partition key; ids still come from simulations_id_seq and
+stay unique. The existing rows are copied in this migration, inside its
+transaction: on a large table run it in a maintenance window.
+"""
+
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "005"
+down_revision = "004"
+branch_labels = None
+depends_on = None
+
+SIMULATION_PARTITIONS = int(os.getenv("SIMULATION_PARTITIONS", "16"))
+
+COLUMNS = [
+    "id",
+    "user_id",
+    "property_value",
+    "down_payment_percentage",
+    "contract_years",
+    "down_payment_amount",
+    "financing_amount",
+    "total_to_save",
+    "monthly_savings",
+    "property_address",
+    "property_type",
+    "notes",
+    "created_at",
+    "updated_at",
+]
+
+
+def copy_columns() -> str:
+    # Generated columns (scripts/generate_derived_columns.py) are computed again
+    # on insert; ask the database which ones are, as the app setting may differ
+    generated = set(
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = 'simulations' "
+                "AND is_generated = 'ALWAYS'"
+            )
+        )
+        .scalars()
+    )
+    return ", ".join(name for name in COLUMNS if name not in generated)
+
+
+def rebuild_simulations(old: str, partitioned: bool) -> None:
+    """Recreate ``simulations`` from the table renamed to ``old``, then drop ``old``."""
+    op.execute(f"ALTER TABLE simulations RENAME TO {old}")
+    op.execute(f"ALTER INDEX simulations_pkey RENAME TO {old}_pkey")
+    op.execute(
+        "ALTER INDEX ix_simulations_user_id_created_at_id "
+        f"RENAME TO ix_{old}_user_id_created_at_id"
+    )
+    op.execute("DROP INDEX IF EXISTS ix_simulations_id")
+
+    # LIKE carries over the column types, NOT NULLs, the id sequence default
+    # and any generated-column expressions
+    op.execute(
+        f"CREATE TABLE simulations (LIKE {old} INCLUDING DEFAULTS INCLUDING GENERATED)"
+        + (" PARTITION BY HASH (user_id)" if partitioned else "")
+    )
+    if partitioned:
+        op.execute("ALTER TABLE simulations ADD PRIMARY KEY (id, user_id)")
+        for remainder in range(SIMULATION_PARTITIONS):
+            op.execute(
+                f"CREATE TABLE simulations_p{remainder} PARTITION OF simulations "
+                f"FOR VALUES WITH (MODULUS {SIMULATION_PARTITIONS}, "
+                f"REMAINDER {remainder})"
+            )
+    else:
+        op.execute("ALTER TABLE simulations ADD PRIMARY KEY (id)")
+        op.create_index("ix_simulations_id", "simulations", ["id"], unique=False)
+    op.create_foreign_key(None, "simulations", "users", ["user_id"], ["id"])
+    op.create_index(
+        "ix_simulations_user_id_created_at_id",
+        "simulations",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+
+    columns = copy_columns()
+    op.execute(f"INSERT INTO simulations ({columns}) SELECT {columns} FROM {old}")
+    # The sequence belongs to the old id column; move it before the drop takes it along
+    op.execute("ALTER SEQUENCE simulations_id_seq OWNED BY simulations.id")
+    op.execute(f"DROP TABLE {old}")
+
+
+def upgrade() -> None:
+    op.create_table(
+        "simulations_archive",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("property_value", sa.Float(), nullable=False),
+        sa.Column("down_payment_percentage", sa.Float(), nullable=False),
+        sa.Column("contract_years", sa.Integer(), nullable=False),
+        sa.Column("down_payment_amount", sa.Float(), nullable=False),
+        sa.Column("financing_amount", sa.Float(), nullable=False),
+        sa.Column("total_to_save", sa.Float(), nullable=False),
+        sa.Column("monthly_savings", sa.Float(), nullable=False),
+        sa.Column("property_address", sa.Text(), nullable=True),
+        sa.Column("property_type", sa.String(), nullable=True),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "archived_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=True,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "ix_simulations_archive_user_id",
+        "simulations_archive",
+        ["user_id"],
+        unique=False,
+    )
+
+    if SIMULATION_PARTITIONS > 1:
+        rebuild_simulations("simulations_unpartitioned", partitioned=True)
+
+
+def downgrade() -> None:
+    if SIMULATION_PARTITIONS > 1:
+        rebuild_simulations("simulations_partitioned", partitioned=False)
+
+    # Bring archived rows back rather than dropping them with the table. The
+    # archival job took them out of the statistics rollups; re-seed those (see
+    # migration 003) if the rollup is enabled.
+    columns = copy_columns()
+    op.execute(
+        f"INSERT INTO simulations ({columns}) SELECT {columns} FROM simulations_archive"
+    )
+    op.drop_index("ix_simulations_archive_user_id", table_name="simulations_archive")
+    op.drop_table("simulations_archive")
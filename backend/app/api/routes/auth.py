@@ -1,9 +1,9 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ...db import get_db
+from ...db import get_primary_db
 from ... import schemas
 from ...core.security import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 from ...crud.users import UserRepository
@@ -11,20 +11,24 @@ from ...crud.users import UserRepository
 router = APIRouter()
 
 
+# Both read a user that may have been created moments ago, so skip the replicas
 @router.post("/register", response_model=schemas.User)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if UserRepository.get_user_by_email(db, user.email):
+async def register(
+    user: schemas.UserCreate, db: AsyncSession = Depends(get_primary_db)
+):
+    if await UserRepository.get_user_by_email(db, user.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
-    return UserRepository.create_user(db, user)
+    return await UserRepository.create_user(db, user)
 
 
 @router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,67 +1,194 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ... import models, schemas
-from ...db import get_db
+from ...db import AsyncSessionLocal, get_db, get_primary_db
 from ...core.security import get_current_active_user
+from ...services.amortization import AMORTIZATION_SYSTEMS, SCHEDULE_GRANULARITIES
+from ...services.exports import EXPORT_FORMATS
+from ...services.imports import IMPORT_FORMATS, detect_format
+from ...services.serialization import (
+    LISTING_FIELDS,
+    LISTING_VIEWS,
+    listing_columns,
+    listing_json,
+    resolve_listing_fields,
+)
 from ...services.simulations import SimulationService
 
 router = APIRouter()
 
+# Opt-in: serve full listings from row tuples with orjson, skipping ORM objects
+# and response-model validation. The JSON is identical to the default path.
+# Projected listings (fields= / view=summary) always take this path.
+FAST_LISTING_ENABLED = os.getenv("SIMULATION_FAST_LISTING", "false").lower() == "true"
+
 
 @router.post("/", response_model=schemas.Simulation)
 async def create_simulation(
     simulation: schemas.SimulationCreate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_db),
+):
+    return await SimulationService.create_simulation(db, simulation, current_user.id)
+
+
+@router.post("/import", response_model=schemas.SimulationImportResponse)
+async def import_simulations(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern=f"^({'|'.join(IMPORT_FORMATS)})$"),
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    return SimulationService.create_simulation(db, simulation, current_user.id)
+    fmt = detect_format(format, file.filename, file.content_type)
+    return await SimulationService.import_simulations(
+        db, current_user.id, file.file, fmt
+    )
 
 
 @router.get("/", response_model=schemas.SimulationsListResponse)
 async def get_user_simulations(
-    skip: int = 0,
-    limit: int = 100,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[str] = Query(
+        None, description=f"Comma-separated subset of: {', '.join(LISTING_FIELDS)}"
+    ),
+    view: str = Query("full", pattern=f"^({'|'.join(LISTING_VIEWS)})$"),
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List simulations, newest first.
+
+    ``fields`` or ``view=summary`` select only those columns from the database;
+    the summary view leaves out the free-text ``notes`` and ``property_address``.
+    """
+    projected = resolve_listing_fields(fields, view)
+    if projected is not None or FAST_LISTING_ENABLED:
+        projected = projected or LISTING_FIELDS
+        columns = listing_columns(projected)
+        rows, total, next_cursor = await SimulationService.get_user_simulations(
+            db, current_user.id, skip, limit, cursor, include_total, columns
+        )
+        return Response(
+            listing_json(rows, total, next_cursor, projected, columns),
+            media_type="application/json",
+        )
+
+    simulations, total, next_cursor = await SimulationService.get_user_simulations(
+        db, current_user.id, skip, limit, cursor, include_total
+    )
+    return schemas.SimulationsListResponse(
+        simulations=simulations, total=total, next_cursor=next_cursor
+    )
+
+
+@router.get("/export")
+async def export_simulations(
+    format: str = Query("csv", pattern=f"^({'|'.join(EXPORT_FORMATS)})$"),
+    current_user: models.User = Depends(get_current_active_user),
+):
+    user_id = current_user.id
+
+    async def body():
+        # The stream outlives the request handler, so it owns its session
+        async with AsyncSessionLocal(info={"user_id": user_id}) as db:
+            async for chunk in SimulationService.export_simulations(
+                db, user_id, format
+            ):
+                yield chunk
+
+    return StreamingResponse(
+        body(),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="simulations.{format}"'},
+    )
+
+
+@router.get("/statistics")
+async def get_simulation_statistics(
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db),
+):
+    return await SimulationService.get_simulation_statistics(db, current_user.id)
+
+
+@router.patch("/batch", response_model=schemas.SimulationBatchResult)
+async def batch_update_simulations(
+    batch: schemas.SimulationBatchUpdate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    simulations, total = SimulationService.get_user_simulations(db, current_user.id, skip, limit)
-    return schemas.SimulationsListResponse(simulations=simulations, total=total)
+    return await SimulationService.batch_update(db, batch, current_user.id)
+
+
+@router.delete("/batch", response_model=schemas.SimulationBatchResult)
+async def batch_delete_simulations(
+    batch: schemas.SimulationBatchDelete,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_primary_db),
+):
+    return await SimulationService.batch_delete(db, batch, current_user.id)
 
 
 @router.get("/{simulation_id}", response_model=schemas.Simulation)
 async def get_simulation(
     simulation_id: int,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return SimulationService.get_simulation(db, simulation_id, current_user.id)
+    return await SimulationService.get_simulation(db, simulation_id, current_user.id)
 
 
-@router.put("/{simulation_id}", response_model=schemas.Simulation)
-async def update_simulation(
+@router.get("/{simulation_id}/schedule", response_model=schemas.AmortizationSchedule)
+async def get_amortization_schedule(
     simulation_id: int,
-    simulation_update: schemas.SimulationUpdate,
+    annual_interest_rate: float = Query(..., ge=0, le=100),
+    system: str = Query("price", pattern=f"^({'|'.join(AMORTIZATION_SYSTEMS)})$"),
+    granularity: str = Query(
+        "month", pattern=f"^({'|'.join(SCHEDULE_GRANULARITIES)})$"
+    ),
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return SimulationService.update_simulation(db, simulation_id, simulation_update, current_user.id)
+    return await SimulationService.get_amortization_schedule(
+        db, simulation_id, current_user.id, system, annual_interest_rate, granularity
+    )
 
 
-@router.delete("/{simulation_id}")
-async def delete_simulation(
+@router.post("/{simulation_id}/montecarlo", response_model=schemas.MonteCarloResult)
+async def run_monte_carlo(
     simulation_id: int,
+    request: schemas.MonteCarloRequest,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    return SimulationService.delete_simulation(db, simulation_id, current_user.id)
+    return await SimulationService.run_monte_carlo(
+        db, simulation_id, current_user.id, request
+    )
 
 
-@router.get("/statistics")
-async def get_simulation_statistics(
+@router.put("/{simulation_id}", response_model=schemas.Simulation)
+async def update_simulation(
+    simulation_id: int,
+    simulation_update: schemas.SimulationUpdate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    return SimulationService.get_simulation_statistics(db, current_user.id)
+    return await SimulationService.update_simulation(
+        db, simulation_id, simulation_update, current_user.id
+    )
 
 
+@router.delete("/{simulation_id}")
+async def delete_simulation(
+    simulation_id: int,
+    current_user: models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_primary_db),
+):
+    return await SimulationService.delete_simulation(db, simulation_id, current_user.id)
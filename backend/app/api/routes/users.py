@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ... import models, schemas
-from ...db import get_db
+from ...db import get_primary_db
 from ...core.security import get_current_active_user
 from ...crud.users import UserRepository
 
@@ -18,8 +18,8 @@ async def read_users_me(current_user: models.User = Depends(get_current_active_u
 async def update_user_me(
     user_update: schemas.UserUpdate,
     current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_primary_db),
 ):
-    return UserRepository.update_user(db, current_user.id, user_update)
+    return await UserRepository.update_user(db, current_user.id, user_update)
 
 
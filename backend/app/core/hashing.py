@@ -0,0 +1,105 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.registry import get_crypt_handler
+
+# The first scheme hashes new passwords; the others are still accepted and are
+# transparently upgraded on the next successful login. "argon2" needs the
+# optional argon2-cffi package.
+PASSWORD_SCHEMES = [
+    scheme.strip()
+    for scheme in os.getenv("PASSWORD_SCHEMES", "bcrypt").split(",")
+    if scheme.strip()
+]
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "1"))
+
+PASSWORD_HASH_WORKERS = int(
+    os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))
+)
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64"))
+
+
+def build_context(
+    schemes: list[str], bcrypt_rounds: int = BCRYPT_ROUNDS
+) -> CryptContext:
+    """CryptContext where any hash not matching the current cost needs an update."""
+    unknown = [scheme for scheme in schemes if get_crypt_handler(scheme, None) is None]
+    if unknown or not schemes:
+        raise ValueError(
+            f"PASSWORD_SCHEMES must list known passlib schemes, got {schemes!r}"
+        )
+    settings = {
+        "bcrypt__default_rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+    }
+    if "argon2" in schemes:
+        settings.update(
+            argon2__time_cost=ARGON2_TIME_COST,
+            argon2__memory_cost=ARGON2_MEMORY_COST,
+            argon2__parallelism=ARGON2_PARALLELISM,
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **settings)
+
+
+class PasswordHasher:
+    """Runs hashing on a dedicated thread pool so the event loop keeps serving.
+
+    bcrypt and argon2 release the GIL while hashing, so ``workers`` threads
+    give real parallelism. At most ``max_pending`` operations may be queued or
+    running; beyond that callers get a 503 instead of piling up latency.
+    """
+
+    def __init__(self, context: CryptContext, workers: int, max_pending: int):
+        self.context = context
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password-hash"
+        )
+        self._lock = threading.Lock()
+        self.pending = 0
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many concurrent password operations, retry shortly",
+                    headers={"Retry-After": "1"},
+                )
+            self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, fn, *args
+            )
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str):
+        """Return ``(valid, new_hash)``.
+
+        ``new_hash`` is set when the stored hash is outdated.
+        """
+        return await self._run(
+            self.context.verify_and_update, password, hashed_password
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+pwd_context = build_context(PASSWORD_SCHEMES)
+password_hasher = PasswordHasher(
+    pwd_context, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING
+)
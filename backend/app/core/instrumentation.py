@@ -0,0 +1,251 @@
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+from .metrics import RequestMetrics
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged with the route that issued them
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+# The same SQL text run this many times in one request is reported as a likely
+# N+1 pattern (executemany counts once); 0 disables the check.
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv("DB_REPEATED_QUERY_THRESHOLD", "5"))
+
+
+class QueryStats:
+    """Queries issued and time spent in the database on behalf of one request."""
+
+    __slots__ = ("count", "seconds", "statements", "scope")
+
+    def __init__(self, scope: Optional[dict] = None):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter[str] = Counter()
+        # The ASGI scope; routing stores the matched route in it after we start
+        self.scope = scope
+
+    @property
+    def route(self) -> str:
+        if self.scope is None:
+            return "-"
+        return f"{self.scope.get('method')} {route_template(self.scope)}"
+
+    def repeated(self, threshold: int) -> list[tuple[str, int]]:
+        return [(sql, n) for sql, n in self.statements.most_common() if n >= threshold]
+
+
+def route_template(scope: dict) -> str:
+    """``/simulations/{simulation_id}`` for ``/simulations/42``; "unmatched" if none.
+
+    Rebuilt from the path and its parameters because the matched route object
+    only knows its own path, not the prefixes of the routers it was included in.
+    """
+    if scope.get("route") is None:
+        return "unmatched"
+    segments = scope["path"].split("/")
+    for name, value in scope.get("path_params", {}).items():
+        for i in range(len(segments) - 1, -1, -1):
+            if segments[i] == str(value):
+                segments[i] = "{" + name + "}"
+                break
+    return "/".join(segments)
+
+
+# Set by the middleware for the duration of a request. The engine hooks run in
+# the request's context (also under the async engine's greenlet bridge), so they
+# find the request's QueryStats here; outside requests it is None.
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+class ColdStart:
+    """Time from importing the app to its first successful response.
+
+    The clock starts when this module is imported, which app.db does before
+    anything else in the app, so the import of the app itself is included.
+    """
+
+    def __init__(self):
+        self.imported = time.perf_counter()
+        self.ready: Optional[float] = None
+        self.first_success: Optional[float] = None
+
+    def mark_ready(self) -> None:
+        self.ready = time.perf_counter() - self.imported
+
+    def observe(self, status: int) -> None:
+        if self.first_success is None and status < 400:
+            self.first_success = time.perf_counter() - self.imported
+            logger.info(
+                "Cold start: first successful response %.1f ms after import "
+                "(ready at %s)",
+                self.first_success * 1000,
+                "-" if self.ready is None else f"{self.ready * 1000:.1f} ms",
+            )
+
+    def phases(self) -> dict:
+        return {
+            phase: seconds
+            for phase, seconds in (
+                ("ready", self.ready),
+                ("first_success", self.first_success),
+            )
+            if seconds is not None
+        }
+
+
+request_metrics = RequestMetrics()
+cold_start = ColdStart()
+# Every statement, including ones issued outside a request (startup, scripts)
+total_query_stats = QueryStats()
+
+# Active assert_max_queries blocks. Process-wide rather than context-local so a
+# test sees statements the app runs on TestClient's event-loop thread.
+_watchers: list["assert_max_queries"] = []
+_watchers_lock = threading.Lock()
+
+
+def instrument_engine(target) -> None:
+    """Time every statement on ``target``: an Engine, or the Engine class for all."""
+
+    @event.listens_for(target, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_query(statement, time.perf_counter() - conn.info["query_started"].pop())
+
+    @event.listens_for(target, "handle_error")
+    def handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started"):
+            record_query(
+                exception_context.statement or "",
+                time.perf_counter() - conn.info["query_started"].pop(),
+            )
+
+
+def record_query(statement: str, seconds: float) -> None:
+    total_query_stats.count += 1
+    total_query_stats.seconds += seconds
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += seconds
+        stats.statements[statement] += 1
+    if seconds * 1000 >= DB_SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1f ms) on %s: %s",
+            seconds * 1000,
+            stats.route if stats is not None else "-",
+            " ".join(statement.split())[:1000],
+        )
+    if _watchers:
+        with _watchers_lock:
+            for watcher in _watchers:
+                watcher.statements.append(statement)
+
+
+def report_repeated_queries(stats: QueryStats) -> None:
+    if DB_REPEATED_QUERY_THRESHOLD <= 0:
+        return
+    for statement, count in stats.repeated(DB_REPEATED_QUERY_THRESHOLD):
+        logger.warning(
+            "Possible N+1 on %s: statement ran %d times: %s",
+            stats.route,
+            count,
+            " ".join(statement.split())[:1000],
+        )
+
+
+class assert_max_queries:
+    """Fail if more than ``limit`` SQL statements run inside the block.
+
+    Use as ``with assert_max_queries(2): ...`` or as a decorator on sync or
+    async test functions. Counts every statement the process runs meanwhile,
+    including those of requests made through ``TestClient``.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.statements: list[str] = []
+
+    def __enter__(self):
+        with _watchers_lock:
+            _watchers.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with _watchers_lock:
+            _watchers.remove(self)
+        if exc_type is None and len(self.statements) > self.limit:
+            listing = "\n".join(
+                f"  {i}. {' '.join(sql.split())}"
+                for i, sql in enumerate(self.statements, 1)
+            )
+            raise AssertionError(
+                f"Expected at most {self.limit} queries, "
+                f"{len(self.statements)} ran:\n{listing}"
+            )
+        return False
+
+    def __call__(self, fn):
+        if inspect.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with assert_max_queries(self.limit):
+                    return await fn(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with assert_max_queries(self.limit):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+
+async def metrics_middleware(request: Request, call_next):
+    """Record latency, status and DB usage per route template.
+
+    Latency runs until the response starts; streamed bodies (exports, large
+    sweeps) are not included. Unmatched paths share one label so scans for
+    random URLs cannot blow up the series count.
+    """
+    stats = QueryStats(request.scope)
+    token = current_query_stats.set(stats)
+    request_metrics.started()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        request_metrics.finished(
+            request.method,
+            route_template(request.scope),
+            status,
+            time.perf_counter() - started,
+            stats.count,
+            stats.seconds,
+        )
+        report_repeated_queries(stats)
+        cold_start.observe(status)
+        current_query_stats.reset(token)
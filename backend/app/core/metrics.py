@@ -0,0 +1,138 @@
+import threading
+
+# Upper bounds in seconds; wide enough for pool waits as well as request latency.
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets, self._counts):
+                running += count
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self.count
+            return {
+                "count": self.count,
+                "sum": round(self.sum, 6),
+                "max": round(self.max, 6),
+                "buckets": cumulative,
+            }
+
+
+# Upper bounds for "queries issued by one request"
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestMetrics:
+    """Per-route latency, status and database usage, keyed on the route template."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency: dict[tuple, Histogram] = {}
+        self.queries: dict[tuple, Histogram] = {}
+        self.db_seconds: dict[tuple, Histogram] = {}
+        self.responses: dict[tuple, int] = {}
+
+    def started(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def finished(
+        self,
+        method: str,
+        route: str,
+        status: int,
+        seconds: float,
+        queries: int,
+        db_seconds: float,
+    ) -> None:
+        key = (method, route)
+        with self._lock:
+            self.in_flight -= 1
+            if key not in self.latency:
+                self.latency[key] = Histogram()
+                self.queries[key] = Histogram(QUERY_COUNT_BUCKETS)
+                self.db_seconds[key] = Histogram()
+            self.responses[key + (status,)] = self.responses.get(key + (status,), 0) + 1
+        self.latency[key].observe(seconds)
+        self.queries[key].observe(queries)
+        self.db_seconds[key].observe(db_seconds)
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+class PrometheusText:
+    """Builds a Prometheus text-format (0.0.4) exposition, one family at a time."""
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self):
+        self._lines: list[str] = []
+
+    def _family(self, name: str, kind: str, help_text: str) -> None:
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+
+    def gauge(
+        self, name: str, help_text: str, samples: list[tuple[dict, float]]
+    ) -> None:
+        self._family(name, "gauge", help_text)
+        self._lines.extend(
+            f"{name}{_labels(labels)} {value}" for labels, value in samples
+        )
+
+    def counter(
+        self, name: str, help_text: str, samples: list[tuple[dict, float]]
+    ) -> None:
+        # In 0.0.4 a counter family is named like its samples, suffix included
+        name = f"{name}_total"
+        self._family(name, "counter", help_text)
+        self._lines.extend(
+            f"{name}{_labels(labels)} {value}" for labels, value in samples
+        )
+
+    def histogram(
+        self, name: str, help_text: str, series: list[tuple[dict, Histogram]]
+    ) -> None:
+        self._family(name, "histogram", help_text)
+        for labels, histogram in series:
+            snapshot = histogram.snapshot()
+            for bound, count in snapshot["buckets"].items():
+                self._lines.append(
+                    f"{name}_bucket{_labels({**labels, 'le': bound})} {count}"
+                )
+            self._lines.append(f"{name}_sum{_labels(labels)} {snapshot['sum']}")
+            self._lines.append(f"{name}_count{_labels(labels)} {snapshot['count']}")
+
+    def text(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,86 @@
+import logging
+import time
+
+from sqlalchemy.pool import QueuePool
+
+from .metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMonitor:
+    """Records how long callers wait for a free pooled connection.
+
+    Opening new connections is timed separately in ``connect_seconds``, so a
+    slow database handshake is not mistaken for pool starvation. ``pool`` is
+    attached once the engine exists so ``stats`` can report the live
+    checked-out / overflow counts next to the histograms.
+    """
+
+    def __init__(self, name: str, warn_after: float):
+        self.name = name
+        self.warn_after = warn_after
+        self.wait_seconds = Histogram()
+        self.connect_seconds = Histogram()
+        self.pool = None
+
+    def observe_wait(self, pool, seconds: float) -> None:
+        self.wait_seconds.observe(seconds)
+        if seconds >= self.warn_after:
+            logger.warning(
+                "Waited %.1f ms for a %s database connection (%s)",
+                seconds * 1000,
+                self.name,
+                pool.status(),
+            )
+
+    def stats(self) -> dict:
+        stats = {
+            "name": self.name,
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "connect_seconds": self.connect_seconds.snapshot(),
+        }
+        if isinstance(self.pool, QueuePool):
+            stats.update(
+                size=self.pool.size(),
+                checked_in=self.pool.checkedin(),
+                checked_out=self.pool.checkedout(),
+                overflow=max(self.pool.overflow(), 0),
+            )
+        return stats
+
+
+def monitored_pool_class(
+    base: type[QueuePool], monitor: PoolMonitor
+) -> type[QueuePool]:
+    """Subclass ``base`` so checkouts report their wait and connect times.
+
+    QueuePool has no event that fires before a checkout blocks, so the wait is
+    timed around the get on its internal queue, which is where a checkout
+    waits for a free slot. New connections are timed in
+    ``_create_connection``.
+    """
+
+    class MonitoredPool(base):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            queue_get = self._pool.get
+
+            def timed_get(block=True, timeout=None):
+                started = time.perf_counter()
+                try:
+                    return queue_get(block, timeout)
+                finally:
+                    monitor.observe_wait(self, time.perf_counter() - started)
+
+            self._pool.get = timed_get
+
+        def _create_connection(self):
+            started = time.perf_counter()
+            try:
+                return super()._create_connection()
+            finally:
+                monitor.connect_seconds.observe(time.perf_counter() - started)
+
+    MonitoredPool.__name__ = f"Monitored{base.__name__}"
+    return MonitoredPool
@@ -0,0 +1,130 @@
+import itertools
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import Select, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+
+class ReplicaSet:
+    """Round-robin over read replicas, skipping the ones recently ejected.
+
+    A replica is ejected for ``eject_seconds`` when connecting to it fails or
+    its connection drops; afterwards it is simply tried again. Users who
+    committed a write within ``sticky_seconds`` read from the primary so they
+    see their own changes despite replication lag. That record is per process:
+    across workers the window only holds for requests that land on the same one.
+    """
+
+    def __init__(
+        self, engines: list[AsyncEngine], eject_seconds: float, sticky_seconds: float
+    ):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self.sticky_seconds = sticky_seconds
+        self._turn = itertools.count()
+        self._ejected_until: dict[int, float] = {}
+        self._recent_writes: dict[int, float] = {}
+        self._lock = threading.Lock()
+        for index, engine in enumerate(engines):
+            event.listen(engine.sync_engine, "handle_error", self._error_handler(index))
+
+    def _error_handler(self, index: int):
+        def handle_error(context):
+            # No connection means the connect itself failed
+            if context.is_disconnect or context.connection is None:
+                self.eject(index)
+
+        return handle_error
+
+    def eject(self, index: int) -> None:
+        with self._lock:
+            self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        logger.warning(
+            "Read replica %d ejected for %.0f s after a connection error",
+            index,
+            self.eject_seconds,
+        )
+
+    def healthy(self, index: int) -> bool:
+        return self._ejected_until.get(index, 0) <= time.monotonic()
+
+    def choose(self) -> Optional[int]:
+        """Index of the next healthy replica, or None when all are ejected."""
+        for _ in range(len(self.engines)):
+            index = next(self._turn) % len(self.engines)
+            if self.healthy(index):
+                return index
+        return None
+
+    def note_write(self, user_id: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._recent_writes[user_id] = now + self.sticky_seconds
+            if len(self._recent_writes) > 10_000:
+                self._recent_writes = {
+                    user: until
+                    for user, until in self._recent_writes.items()
+                    if until > now
+                }
+
+    def wrote_recently(self, user_id: int) -> bool:
+        return self._recent_writes.get(user_id, 0) > time.monotonic()
+
+    def stats(self) -> list[dict]:
+        return [
+            {"index": index, "healthy": self.healthy(index)}
+            for index in range(len(self.engines))
+        ]
+
+
+class RoutingSession(Session):
+    """Sends plain reads to a replica and everything else to the primary bind.
+
+    The session sticks to the primary once it has written, since its own
+    changes must stay visible to it. It also uses the primary when
+    ``info["use_primary"]`` is set, or when ``info["user_id"]`` names a user
+    who wrote within the sticky window. Otherwise the first read picks a
+    replica, and the session keeps it while it stays healthy. With no
+    replicas configured, this is a plain Session.
+    """
+
+    def __init__(self, *args, replicas: Optional[ReplicaSet] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        primary = super().get_bind(mapper, clause=clause, **kwargs)
+        replicas = self.replicas
+        if not replicas or not replicas.engines:
+            return primary
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["wrote"] = True
+            return primary
+        if not isinstance(clause, Select) or clause._for_update_arg is not None:
+            return primary
+        if self.info.get("wrote") or self.info.get("use_primary"):
+            return primary
+        user_id = self.info.get("user_id")
+        if user_id is not None and replicas.wrote_recently(user_id):
+            return primary
+
+        index = self.info.get("replica")
+        if index is None or not replicas.healthy(index):
+            index = self.info["replica"] = replicas.choose()
+        if index is None:
+            return primary
+        return replicas.engines[index].sync_engine
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def remember_writer(session: RoutingSession) -> None:
+    user_id = session.info.get("user_id")
+    if session.replicas and session.info.get("wrote") and user_id is not None:
+        session.replicas.note_write(user_id)
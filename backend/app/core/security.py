@@ -1,23 +1,29 @@
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..db import get_db
 from .. import models, schemas
+from .cache import TTLCache
+from .hashing import password_hasher, pwd_context
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-here-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Users resolved by get_current_user, keyed by token subject (email), stored as
+# session-free copies (see user_snapshot). Entries are dropped by UserRepository
+# on update/delete; the TTL bounds staleness across worker processes, which do
+# not see each other's invalidations.
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL_SECONDS)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
@@ -29,12 +35,19 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = db.query(models.User).filter(models.User.email == email).first()
+async def authenticate_user(db: AsyncSession, email: str, password: str):
+    user = await db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(
+        password, user.hashed_password
+    )
+    if not valid:
         return False
+    if new_hash:
+        # Stored hash predates the current scheme or cost factor; upgrade it in place
+        user.hashed_password = new_hash
+        await db.commit()
     return user
 
 
@@ -46,7 +59,20 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def user_snapshot(user: models.User) -> models.User:
+    """A copy of ``user``'s columns attached to no session.
+
+    The loaded instance belongs to the request's session, and a rollback or
+    the session closing would expire or detach it under every later request
+    served from the cache.
+    """
+    columns = inspect(models.User).column_attrs
+    return models.User(**{attr.key: getattr(user, attr.key) for attr in columns})
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)
+):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -61,9 +87,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    user = user_cache.get(token_data.email)
     if user is None:
-        raise credentials_exception
+        query = select(models.User).where(models.User.email == token_data.email)
+        user = await db.scalar(query)
+        if user is None and db.info.get("replica") is not None:
+            # The replica may lag behind; only the primary can tell the account is gone
+            db.info["use_primary"] = True
+            user = await db.scalar(query)
+            db.info.pop("use_primary")
+        if user is None:
+            raise credentials_exception
+        user = user_snapshot(user)
+        user_cache.set(token_data.email, user)
+
+    # Lets the session keep this user's reads on the primary right after they write
+    db.info["user_id"] = user.id
     return user
 
 
@@ -71,5 +110,3 @@ async def get_current_active_user(current_user: models.User = Depends(get_curren
     if not current_user:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
-
-
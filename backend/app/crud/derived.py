@@ -0,0 +1,84 @@
+import os
+
+from sqlalchemy import Float, Integer, column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+from ..services.calculations import SAVINGS_RATE, WHOLE_NUMBERS_FROM
+
+# When enabled the derived columns are generated by the database from the
+# inputs (scripts/generate_derived_columns.py converts them), and writes send
+# inputs only.
+DERIVED_VALUES_IN_DB = os.getenv("SIMULATION_DERIVED_IN_DB", "false").lower() == "true"
+DERIVED_FIELDS = (
+    "down_payment_amount",
+    "financing_amount",
+    "total_to_save",
+    "monthly_savings",
+)
+
+
+class round2(FunctionElement):
+    """SQL twin of ``calculations.round2``: cents, round half to even.
+
+    Written as ``rint(x * 100) / 100``, the same steps NumPy takes, so a value
+    computed in the database is bit-for-bit the one Python would store. Whole
+    numbers beyond 2**52 are passed through unscaled, as in Python.
+    """
+
+    type = Float()
+    name = "round2"
+    inherit_cache = True
+
+
+@compiles(round2)
+def _round2_default(element, compiler, **kw):
+    # PostgreSQL's round(double precision) is rint(): ties go to the even neighbour
+    value = compiler.process(element.clauses, **kw)
+    return (
+        f"(CASE WHEN abs({value}) < {WHOLE_NUMBERS_FROM!r} "
+        f"THEN round(({value}) * 100) / 100 ELSE {value} END)"
+    )
+
+
+@compiles(round2, "sqlite")
+def _round2_sqlite(element, compiler, **kw):
+    # SQLite's round() sends ties away from zero, so resolve them by hand. The
+    # inputs are never negative, so the integer cast truncates to the floor and
+    # the fraction it leaves is exact.
+    value = compiler.process(element.clauses, **kw)
+    cents = f"(({value}) * 100)"
+    whole = f"CAST({cents} AS INTEGER)"
+    return (
+        f"(CASE WHEN abs({value}) >= {WHOLE_NUMBERS_FROM!r} THEN {value} "
+        f"ELSE (CASE WHEN {cents} - {whole} > 0.5 THEN {whole} + 1 "
+        f"WHEN {cents} - {whole} < 0.5 THEN {whole} "
+        f"ELSE {whole} + {whole} % 2 END) / 100.0 END)"
+    )
+
+
+def derived_values_sql(property_value, down_payment_percentage, contract_years) -> dict:
+    """SQL expressions for the derived columns, mirroring ``derive_values``.
+
+    Arguments may be columns or bound values; the arithmetic is in the same
+    order as the NumPy version so both produce identical doubles.
+    """
+    down_payment_amount = property_value * (down_payment_percentage / 100.0)
+    financing_amount = property_value - down_payment_amount
+    total_to_save = property_value * SAVINGS_RATE
+    monthly_savings = total_to_save / (contract_years * 12)
+    return {
+        "down_payment_amount": round2(down_payment_amount),
+        "financing_amount": round2(financing_amount),
+        "total_to_save": round2(total_to_save),
+        "monthly_savings": round2(monthly_savings),
+    }
+
+
+def generated_expressions() -> dict:
+    """``derived_values_sql`` over the bare input columns, for generated column DDL."""
+    return derived_values_sql(
+        column("property_value", Float),
+        column("down_payment_percentage", Float),
+        column("contract_years", Integer),
+    )
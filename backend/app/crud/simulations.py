@@ -1,68 +1,471 @@
-from sqlalchemy.orm import Session
+import base64
+import json
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    and_,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal,
+    or_,
+    select,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.util import identity_key
 from fastapi import HTTPException, status
 from .. import models, schemas
+from .derived import DERIVED_VALUES_IN_DB, derived_values_sql
+
+# When enabled, create/update/delete keep models.SimulationStats in step so
+# statistics are a primary-key lookup instead of an aggregate over history.
+# With it off the rollup is left alone, so after re-enabling it run
+# scripts/rebuild_simulation_stats.py.
+STATS_ROLLUP_ENABLED = os.getenv("SIMULATION_STATS_ROLLUP", "false").lower() == "true"
+
+INPUT_FIELDS = ("property_value", "down_payment_percentage", "contract_years")
+
+
+def as_utc(value: datetime) -> datetime:
+    """Aware UTC; SQLite hands timestamps back naive, already in UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
 
 
 class SimulationRepository:
+    """Data access for simulations.
+
+    Every statement filters on ``user_id``. Besides scoping rows to their
+    owner, that lets PostgreSQL prune the hash-partitioned table (migration
+    005) to a single partition.
+    """
 
     @staticmethod
-    def create(
-        db: Session,
+    async def create(
+        db: AsyncSession,
         user_id: int,
         data: schemas.SimulationCreate,
         calculated: dict | None = None,
     ) -> models.Simulation:
+        """Insert one simulation and get it back from the same INSERT ... RETURNING."""
         calculated = calculated or {}
-        db_simulation = models.Simulation(
-            user_id=user_id,
-            property_value=data.property_value,
-            down_payment_percentage=data.down_payment_percentage,
-            contract_years=data.contract_years,
-            property_address=data.property_address,
-            property_type=data.property_type,
-            notes=data.notes,
-            **calculated,
+        db_simulation = await db.scalar(
+            insert(models.Simulation)
+            .values(user_id=user_id, **data.model_dump(), **calculated)
+            .returning(models.Simulation)
         )
-        db.add(db_simulation)
-        db.commit()
-        db.refresh(db_simulation)
+        await SimulationRepository._apply_stats_delta(
+            db,
+            user_id,
+            count=1,
+            property_value=db_simulation.property_value,
+            down_payment_percentage=db_simulation.down_payment_percentage,
+            contract_years=db_simulation.contract_years,
+        )
+        await db.commit()
         return db_simulation
 
     @staticmethod
-    def list_by_user(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-        sims = (
-            db.query(models.Simulation)
-            .filter(models.Simulation.user_id == user_id)
-            .offset(skip)
-            .limit(limit)
-            .all()
+    async def bulk_create(db: AsyncSession, user_id: int, rows: list[dict]) -> int:
+        """Insert many simulations in one transaction.
+
+        ``rows`` carry inputs and derived values already. The list form of
+        ``insert()`` goes through SQLAlchemy's insertmanyvalues path, so rows
+        are sent as a few multi-row INSERTs rather than one statement each.
+        """
+        if not rows:
+            return 0
+        await db.execute(
+            insert(models.Simulation), [{**row, "user_id": user_id} for row in rows]
+        )
+        await SimulationRepository._apply_stats_delta(
+            db,
+            user_id,
+            count=len(rows),
+            property_value=sum(row["property_value"] for row in rows),
+            down_payment_percentage=sum(row["down_payment_percentage"] for row in rows),
+            contract_years=sum(row["contract_years"] for row in rows),
+        )
+        await db.commit()
+        return len(rows)
+
+    @staticmethod
+    def encode_cursor(sim: models.Simulation) -> str:
+        raw = json.dumps([as_utc(sim.created_at).isoformat(), sim.id]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> tuple[datetime, int]:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            created_at, sim_id = json.loads(raw)
+            return as_utc(datetime.fromisoformat(created_at)), int(sim_id)
+        except (ValueError, TypeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+            )
+
+    @staticmethod
+    async def list_by_user(
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        include_total: bool = True,
+        columns: list | None = None,
+    ):
+        """Newest-first page of a user's simulations.
+
+        Returns ``(simulations, total, next_cursor)``. Passing ``cursor`` (the
+        ``next_cursor`` of the previous page) seeks straight to the next page
+        through the (user_id, created_at, id) index instead of using OFFSET.
+        With ``columns`` (which must include id and created_at) the page holds
+        plain row tuples of just those columns instead of ORM objects.
+        """
+        created_at = models.Simulation.created_at
+        query = (
+            select(*columns if columns else [models.Simulation])
+            .where(models.Simulation.user_id == user_id)
+            .order_by(models.Simulation.created_at.desc(), models.Simulation.id.desc())
         )
-        total = db.query(models.Simulation).filter(models.Simulation.user_id == user_id).count()
-        return sims, total
+
+        if cursor:
+            cursor_created_at, cursor_id = SimulationRepository.decode_cursor(cursor)
+            query = query.where(
+                or_(
+                    created_at < cursor_created_at,
+                    and_(
+                        created_at == cursor_created_at,
+                        models.Simulation.id < cursor_id,
+                    ),
+                )
+            )
+        else:
+            query = query.offset(skip)
+
+        query = query.limit(limit + 1)
+        if columns:
+            sims = list((await db.execute(query)).all())
+        else:
+            sims = list((await db.scalars(query)).all())
+        next_cursor = None
+        if len(sims) > limit:
+            sims = sims[:limit]
+            next_cursor = SimulationRepository.encode_cursor(sims[-1])
+
+        total = None
+        if include_total:
+            total = (await SimulationRepository.get_stats_for_user(db, user_id))[0]
+        return sims, total, next_cursor
 
     @staticmethod
-    def get_for_user(db: Session, simulation_id: int, user_id: int) -> models.Simulation:
-        sim = (
-            db.query(models.Simulation)
-            .filter(models.Simulation.id == simulation_id, models.Simulation.user_id == user_id)
-            .first()
+    async def stream_for_user(
+        db: AsyncSession, user_id: int, columns, batch_size: int = 1000
+    ):
+        """Yield lists of row tuples for all of a user's simulations, oldest first.
+
+        Uses a server-side cursor (``yield_per``) so only ``batch_size`` rows are
+        held in memory at a time however long the history is.
+        """
+        query = (
+            select(*columns)
+            .where(models.Simulation.user_id == user_id)
+            .order_by(models.Simulation.created_at, models.Simulation.id)
+            .execution_options(yield_per=batch_size)
+        )
+        result = await db.stream(query)
+        async for partition in result.partitions():
+            yield partition
+
+    @staticmethod
+    async def get_for_user(
+        db: AsyncSession, simulation_id: int, user_id: int
+    ) -> models.Simulation:
+        sim = await db.scalar(
+            select(models.Simulation).where(
+                models.Simulation.id == simulation_id,
+                models.Simulation.user_id == user_id,
+            )
         )
         if not sim:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Simulation not found")
         return sim
 
     @staticmethod
-    def update(db: Session, sim: models.Simulation, updates: dict) -> models.Simulation:
-        for field, value in updates.items():
-            setattr(sim, field, value)
-        db.commit()
-        db.refresh(sim)
-        return sim
+    async def update(
+        db: AsyncSession, simulation_id: int, user_id: int, updates: dict
+    ) -> models.Simulation:
+        """Apply ``updates`` with one UPDATE ... RETURNING scoped to ``user_id``.
+
+        When an input changes, the derived columns are recomputed in the same
+        statement from the new inputs and the stored ones (or by the database
+        itself, when it generates them). The statistics rollup needs the
+        previous inputs, so with it enabled they are read first, locking the
+        row until the commit.
+        """
+        sim = models.Simulation
+        values = dict(updates)
+        inputs = {name: values[name] for name in INPUT_FIELDS if name in values}
+        if inputs and not DERIVED_VALUES_IN_DB:
+            values.update(
+                derived_values_sql(
+                    *(
+                        literal(inputs[name], getattr(sim, name).type)
+                        if name in inputs
+                        else getattr(sim, name)
+                        for name in INPUT_FIELDS
+                    )
+                )
+            )
+
+        before = None
+        if inputs and STATS_ROLLUP_ENABLED:
+            before = (
+                await db.execute(
+                    select(*(getattr(sim, name) for name in INPUT_FIELDS))
+                    .where(sim.id == simulation_id, sim.user_id == user_id)
+                    .with_for_update()
+                )
+            ).one_or_none()
+
+        if values:
+            db_simulation = await db.scalar(
+                update(sim)
+                .where(sim.id == simulation_id, sim.user_id == user_id)
+                .values(values)
+                .returning(sim)
+                .execution_options(populate_existing=True)
+            )
+        else:
+            db_simulation = await db.scalar(
+                select(sim).where(sim.id == simulation_id, sim.user_id == user_id)
+            )
+        if db_simulation is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Simulation not found"
+            )
+
+        if before is not None:
+            await SimulationRepository._apply_stats_delta(
+                db,
+                user_id,
+                count=0,
+                property_value=db_simulation.property_value - before[0],
+                down_payment_percentage=(
+                    db_simulation.down_payment_percentage - before[1]
+                ),
+                contract_years=db_simulation.contract_years - before[2],
+            )
+        await db.commit()
+        return db_simulation
 
     @staticmethod
-    def delete(db: Session, sim: models.Simulation):
-        db.delete(sim)
-        db.commit()
+    async def delete(db: AsyncSession, sim: models.Simulation):
+        # Scoped by user_id as well as id so a partitioned table is pruned to
+        # one partition; the ORM's own DELETE would only name the id.
+        await db.execute(
+            delete(models.Simulation)
+            .where(
+                models.Simulation.id == sim.id, models.Simulation.user_id == sim.user_id
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await SimulationRepository._apply_stats_delta(
+            db,
+            sim.user_id,
+            count=-1,
+            property_value=-sim.property_value,
+            down_payment_percentage=-sim.down_payment_percentage,
+            contract_years=-sim.contract_years,
+        )
+        await db.commit()
+        SimulationRepository._forget(db, [sim.id])
         return {"message": "Simulation deleted successfully"}
 
+    @staticmethod
+    async def get_many_for_user(
+        db: AsyncSession,
+        user_id: int,
+        ids: list[int],
+        columns,
+        for_update: bool = False,
+    ) -> list:
+        """Row tuples of ``columns`` for the given ids that belong to ``user_id``.
+
+        ``for_update`` locks the rows until the transaction ends, for callers
+        that write back values derived from what they read.
+        """
+        query = select(*columns).where(
+            models.Simulation.user_id == user_id, models.Simulation.id.in_(ids)
+        )
+        if for_update:
+            query = query.with_for_update()
+        return list((await db.execute(query)).all())
+
+    @staticmethod
+    async def update_many(
+        db: AsyncSession, user_id: int, rows: list[dict], stats_delta: tuple
+    ) -> int:
+        """Write column dicts (each with its ``id``) in one transaction.
+
+        Each row writes only the columns it has. Rows with the same columns
+        share one executemany UPDATE, still scoped to ``user_id`` so an id
+        owned by someone else matches nothing. ``stats_delta`` is the change
+        in the (property_value, down_payment_percentage, contract_years) sums
+        across the batch.
+        """
+        if not rows:
+            return 0
+        table = models.Simulation.__table__
+        groups: dict[tuple, list[dict]] = {}
+        for row in rows:
+            columns = tuple(sorted(name for name in row if name != "id"))
+            if columns:
+                groups.setdefault(columns, []).append(row)
+        for columns, group in groups.items():
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("_id"), table.c.user_id == user_id)
+                .values({name: bindparam(f"_{name}") for name in columns})
+            )
+            await db.execute(
+                statement,
+                [
+                    {"_id": row["id"], **{f"_{name}": row[name] for name in columns}}
+                    for row in group
+                ],
+            )
+        await SimulationRepository._apply_stats_delta(
+            db,
+            user_id,
+            count=0,
+            property_value=stats_delta[0],
+            down_payment_percentage=stats_delta[1],
+            contract_years=stats_delta[2],
+        )
+        await db.commit()
+        SimulationRepository._forget(db, [row["id"] for row in rows])
+        return len(rows)
+
+    @staticmethod
+    async def delete_many(db: AsyncSession, user_id: int, ids: list[int]) -> list[int]:
+        """Delete the given ids that belong to ``user_id``; return the ids deleted."""
+        statement = (
+            delete(models.Simulation)
+            .where(models.Simulation.user_id == user_id, models.Simulation.id.in_(ids))
+            .returning(
+                models.Simulation.id,
+                models.Simulation.property_value,
+                models.Simulation.down_payment_percentage,
+                models.Simulation.contract_years,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        deleted = (await db.execute(statement)).all()
+        if deleted:
+            await SimulationRepository._apply_stats_delta(
+                db,
+                user_id,
+                count=-len(deleted),
+                property_value=-sum(row[1] for row in deleted),
+                down_payment_percentage=-sum(row[2] for row in deleted),
+                contract_years=-sum(row[3] for row in deleted),
+            )
+        await db.commit()
+        deleted_ids = [row[0] for row in deleted]
+        SimulationRepository._forget(db, deleted_ids)
+        return deleted_ids
+
+    @staticmethod
+    def _forget(db: AsyncSession, ids: list[int]) -> None:
+        # Set-based statements bypass the identity map; drop any loaded copies
+        # so later reads in this session go back to the database.
+        for sim_id in ids:
+            sim = db.identity_map.get(identity_key(models.Simulation, sim_id))
+            if sim is not None:
+                db.expunge(sim)
+
+    @staticmethod
+    async def aggregate_for_user(db: AsyncSession, user_id: int) -> tuple:
+        """Return the count and input sums of a user's simulations.
+
+        As (count, property_value, down_payment_percentage, contract_years).
+        """
+        result = await db.execute(
+            select(
+                func.count(models.Simulation.id),
+                func.coalesce(func.sum(models.Simulation.property_value), 0),
+                func.coalesce(func.sum(models.Simulation.down_payment_percentage), 0),
+                func.coalesce(func.sum(models.Simulation.contract_years), 0),
+            ).where(models.Simulation.user_id == user_id)
+        )
+        return tuple(result.one())
+
+    @staticmethod
+    async def get_stats_for_user(db: AsyncSession, user_id: int) -> tuple:
+        if STATS_ROLLUP_ENABLED:
+            rollup = await db.get(
+                models.SimulationStats, user_id, populate_existing=True
+            )
+            if rollup is not None:
+                return (
+                    rollup.simulation_count,
+                    rollup.total_property_value,
+                    rollup.total_down_payment_percentage,
+                    rollup.total_contract_years,
+                )
+        return await SimulationRepository.aggregate_for_user(db, user_id)
+
+    @staticmethod
+    async def _apply_stats_delta(
+        db: AsyncSession,
+        user_id: int,
+        count: int,
+        property_value: float,
+        down_payment_percentage: float,
+        contract_years: int,
+    ):
+        if not STATS_ROLLUP_ENABLED:
+            return
+
+        stats = models.SimulationStats
+        values = {
+            stats.simulation_count: stats.simulation_count + count,
+            stats.total_property_value: stats.total_property_value + property_value,
+            stats.total_down_payment_percentage: stats.total_down_payment_percentage
+            + down_payment_percentage,
+            stats.total_contract_years: stats.total_contract_years + contract_years,
+        }
+        rollup = (
+            update(stats)
+            .where(stats.user_id == user_id)
+            .values(values)
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(rollup)).rowcount:
+            return
 
+        # First write for this user since the rollup was enabled: seed the row
+        # from the table, which already reflects the pending change once flushed.
+        await db.flush()
+        seed = await SimulationRepository.aggregate_for_user(db, user_id)
+        try:
+            async with db.begin_nested():
+                db.add(
+                    stats(
+                        user_id=user_id,
+                        simulation_count=seed[0],
+                        total_property_value=seed[1],
+                        total_down_payment_percentage=seed[2],
+                        total_contract_years=seed[3],
+                    )
+                )
+        except IntegrityError:
+            # A concurrent writer seeded the row first, without our pending change.
+            await db.execute(rollup)
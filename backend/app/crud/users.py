@@ -1,45 +1,49 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException, status
 from .. import models, schemas
-from ..core.security import get_password_hash
+from ..core.hashing import password_hasher
+from ..core.security import user_cache
 
 
 class UserRepository:
 
     @staticmethod
-    def create_user(db: Session, user: schemas.UserCreate):
+    async def create_user(db: AsyncSession, user: schemas.UserCreate):
         try:
-            hashed_password = get_password_hash(user.password)
+            hashed_password = await password_hasher.hash(user.password)
             db_user = models.User(
                 email=user.email, name=user.name, hashed_password=hashed_password
             )
             db.add(db_user)
-            db.commit()
-            db.refresh(db_user)
+            await db.commit()
+            await db.refresh(db_user)
             return db_user
         except IntegrityError:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered",
             )
 
     @staticmethod
-    def get_user_by_email(db: Session, email: str):
-        return db.query(models.User).filter(models.User.email == email).first()
+    async def get_user_by_email(db: AsyncSession, email: str):
+        return await db.scalar(select(models.User).where(models.User.email == email))
 
     @staticmethod
-    def get_user_by_id(db: Session, user_id: int):
-        return db.query(models.User).filter(models.User.id == user_id).first()
+    async def get_user_by_id(db: AsyncSession, user_id: int):
+        return await db.scalar(select(models.User).where(models.User.id == user_id))
 
     @staticmethod
-    def get_users(db: Session, skip: int = 0, limit: int = 100):
-        return db.query(models.User).offset(skip).limit(limit).all()
+    async def get_users(db: AsyncSession, skip: int = 0, limit: int = 100):
+        return (await db.scalars(select(models.User).offset(skip).limit(limit))).all()
 
     @staticmethod
-    def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
-        db_user = UserRepository.get_user_by_id(db, user_id)
+    async def update_user(
+        db: AsyncSession, user_id: int, user_update: schemas.UserUpdate
+    ):
+        db_user = await UserRepository.get_user_by_id(db, user_id)
         if not db_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
@@ -50,20 +54,20 @@ class UserRepository:
             if hasattr(db_user, field):
                 setattr(db_user, field, value)
 
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
+        await db.refresh(db_user)
+        user_cache.invalidate(db_user.email)
         return db_user
 
     @staticmethod
-    def delete_user(db: Session, user_id: int):
-        db_user = UserRepository.get_user_by_id(db, user_id)
+    async def delete_user(db: AsyncSession, user_id: int):
+        db_user = await UserRepository.get_user_by_id(db, user_id)
         if not db_user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
 
-        db.delete(db_user)
-        db.commit()
+        await db.delete(db_user)
+        await db.commit()
+        user_cache.invalidate(db_user.email)
         return {"message": "User deleted successfully"}
-
-
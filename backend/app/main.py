@@ -1,18 +1,76 @@
-from fastapi import FastAPI
+import math
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from .db import engine, Base
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from .db import (
+    DB_POOL_SIZE,
+    async_engine,
+    engine,
+    pool_monitor,
+    replica_engines,
+    replica_pool_monitors,
+    replicas,
+    sync_pool_monitor,
+)
+from .core.hashing import password_hasher
+from .core.instrumentation import (
+    cold_start,
+    metrics_middleware,
+    request_metrics,
+    total_query_stats,
+)
+from .core.metrics import PrometheusText
+from .core.security import user_cache
+from .core.warmup import warm_up
+from .services import montecarlo
 from . import schemas
-from .services.simulations import SimulationService
+from .services.simulations import (
+    SWEEP_CHUNK_CELLS,
+    SimulationService,
+    calculate_cache,
+    schedule_cache,
+)
 from .api.routes import auth as auth_routes
 from .api.routes import users as user_routes
 from .api.routes import simulations as simulation_routes
 
-Base.metadata.create_all(bind=engine)
+# Opt-in: open pool connections, prime caches and build schemas before serving
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() == "true"
+STARTUP_WARMUP_CONNECTIONS = int(
+    os.getenv("STARTUP_WARMUP_CONNECTIONS", str(DB_POOL_SIZE))
+)
+
+# /calculate is a pure function of its inputs, so shared caches may keep it long
+CALCULATE_MAX_AGE_SECONDS = int(os.getenv("CALCULATE_MAX_AGE_SECONDS", "86400"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is managed by Alembic (`alembic upgrade head`), never at startup
+    if STARTUP_WARMUP:
+        await warm_up(app, async_engine, STARTUP_WARMUP_CONNECTIONS)
+    cold_start.mark_ready()
+    yield
+    password_hasher.shutdown()
+    montecarlo.shutdown_executor()
+    await async_engine.dispose()
+    for replica_engine in replica_engines:
+        await replica_engine.dispose()
+    engine.dispose()
+
 
 app = FastAPI(
     title="aMORA Real Estate Simulator API",
     description="API for simulating real estate purchases with mortgage calculations",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -22,6 +80,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.middleware("http")(metrics_middleware)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    # The JSON parser accepts Infinity/NaN, which the 422 body cannot echo back as JSON
+    detail = jsonable_encoder(
+        exc.errors(),
+        custom_encoder={float: lambda x: x if math.isfinite(x) else str(x)},
+    )
+    return JSONResponse(status_code=422, content={"detail": detail})
 
 
 @app.get("/")
@@ -34,25 +103,207 @@ async def health_check():
     return {"status": "healthy", "service": "aMORA API"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Database reachability and live pool saturation, for load balancers and humans."""
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except (SQLAlchemyError, OSError) as exc:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "status": "unavailable",
+                "service": "aMORA API",
+                "error": type(exc).__name__,
+                "pool": pool_monitor.stats(),
+            },
+        )
+    ready = {"status": "ready", "service": "aMORA API", "pool": pool_monitor.stats()}
+    if replica_engines:
+        # Informational: reads fall back to the primary while replicas are ejected
+        ready["replicas"] = [
+            dict(health, pool=monitor.stats())
+            for health, monitor in zip(replicas.stats(), replica_pool_monitors)
+        ]
+    return ready
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint: per-route latency and DB usage, pools and caches."""
+    out = PrometheusText()
+    out.gauge(
+        "http_requests_in_flight",
+        "Requests currently being handled",
+        [({}, request_metrics.in_flight)],
+    )
+    out.counter(
+        "http_responses",
+        "Responses by route template and status code",
+        [
+            ({"method": method, "route": route, "status": status}, count)
+            for (method, route, status), count in sorted(
+                request_metrics.responses.items()
+            )
+        ],
+    )
+    for name, help_text, series in (
+        (
+            "http_request_duration_seconds",
+            "Time to response start",
+            request_metrics.latency,
+        ),
+        (
+            "http_request_db_queries",
+            "SQL statements issued per request",
+            request_metrics.queries,
+        ),
+        (
+            "http_request_db_seconds",
+            "Time spent in SQL per request",
+            request_metrics.db_seconds,
+        ),
+    ):
+        out.histogram(
+            name,
+            help_text,
+            [
+                ({"method": method, "route": route}, histogram)
+                for (method, route), histogram in sorted(series.items())
+            ],
+        )
+    out.gauge(
+        "app_cold_start_seconds",
+        "Seconds from app import to startup complete / first successful response",
+        [
+            ({"phase": phase}, round(seconds, 6))
+            for phase, seconds in cold_start.phases().items()
+        ],
+    )
+    out.counter("db_queries", "SQL statements issued", [({}, total_query_stats.count)])
+    out.counter(
+        "db_query_seconds",
+        "Time spent in SQL",
+        [({}, round(total_query_stats.seconds, 6))],
+    )
+
+    monitors = (pool_monitor, sync_pool_monitor, *replica_pool_monitors)
+    pools = [monitor.stats() for monitor in monitors]
+    out.gauge(
+        "db_pool_checked_out",
+        "Connections currently checked out",
+        [
+            ({"pool": stats["name"]}, stats["checked_out"])
+            for stats in pools
+            if "size" in stats
+        ],
+    )
+    out.histogram(
+        "db_pool_wait_seconds",
+        "Time waiting to check out a connection",
+        [({"pool": monitor.name}, monitor.wait_seconds) for monitor in monitors],
+    )
+    out.histogram(
+        "db_pool_connect_seconds",
+        "Time opening new database connections",
+        [({"pool": monitor.name}, monitor.connect_seconds) for monitor in monitors],
+    )
+    out.gauge(
+        "db_replica_healthy",
+        "1 while a read replica is in rotation, 0 while ejected",
+        [({"replica": str(r["index"])}, int(r["healthy"])) for r in replicas.stats()],
+    )
+
+    caches = {
+        "calculate": calculate_cache,
+        "schedule": schedule_cache,
+        "user": user_cache,
+    }
+    out.counter(
+        "cache_hits", "Cache hits", [({"cache": n}, c.hits) for n, c in caches.items()]
+    )
+    out.counter(
+        "cache_misses",
+        "Cache misses",
+        [({"cache": n}, c.misses) for n, c in caches.items()],
+    )
+    out.gauge(
+        "cache_entries",
+        "Cached entries",
+        [({"cache": n}, len(c)) for n, c in caches.items()],
+    )
+    return PlainTextResponse(out.text(), media_type=PrometheusText.content_type)
+
+
 app.include_router(auth_routes.router, tags=["auth"])
 app.include_router(user_routes.router, prefix="/users", tags=["users"])
 app.include_router(simulation_routes.router, prefix="/simulations", tags=["simulations"])
 
 
+@app.get("/calculate")
+async def calculate_simulation_values_cacheable(
+    property_value: float = Query(..., gt=0),
+    down_payment_percentage: float = Query(..., ge=0, le=100),
+    contract_years: int = Query(..., ge=1, le=30),
+    if_none_match: str | None = Header(default=None),
+):
+    """``POST /calculate`` as a GET, so browsers and CDNs can cache and revalidate."""
+    body, etag = SimulationService.calculate_cached(
+        property_value, down_payment_percentage, contract_years
+    )
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={CALCULATE_MAX_AGE_SECONDS}",
+    }
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=body, headers=headers)
+
+
 @app.post("/calculate")
 async def calculate_simulation_values(simulation_data: schemas.SimulationCreate):
-    calculated_values = SimulationService.calculate_simulation_values(
+    # Memoized in process, but POST responses are not HTTP-cacheable; see GET above
+    body, _ = SimulationService.calculate_cached(
         simulation_data.property_value,
         simulation_data.down_payment_percentage,
         simulation_data.contract_years,
     )
-    return {
-        "input": {
-            "property_value": simulation_data.property_value,
-            "down_payment_percentage": simulation_data.down_payment_percentage,
-            "contract_years": simulation_data.contract_years,
-        },
-        "calculated_values": calculated_values,
-    }
+    return body
+
+
+@app.get("/calculate/cache")
+async def calculate_cache_stats():
+    """Hit rate and occupancy of the /calculate memoization cache."""
+    return calculate_cache.stats()
+
+
+@app.post("/calculate/batch", response_model=schemas.SimulationBatchCalculateResponse)
+async def calculate_simulation_values_batch(batch: schemas.SimulationBatchCalculate):
+    if batch.scenarios is not None:
+        property_values = [s.property_value for s in batch.scenarios]
+        down_payment_percentages = [s.down_payment_percentage for s in batch.scenarios]
+        contract_years = [s.contract_years for s in batch.scenarios]
+    else:
+        property_values = batch.property_value
+        down_payment_percentages = batch.down_payment_percentage
+        contract_years = batch.contract_years
+
+    calculated_values = SimulationService.calculate_batch_values(
+        property_values, down_payment_percentages, contract_years
+    )
+    return {"count": len(property_values), "calculated_values": calculated_values}
 
 
+@app.post("/calculate/sweep", response_model=schemas.SimulationSweepResponse)
+async def calculate_simulation_sweep(sweep: schemas.SimulationSweep):
+    """Cartesian grid over the three input ranges; large grids stream as NDJSON."""
+    axes = SimulationService.sweep_axes(sweep)
+    if len(axes[0]) * len(axes[1]) * len(axes[2]) > SWEEP_CHUNK_CELLS:
+        return StreamingResponse(
+            SimulationService.stream_sweep(axes), media_type="application/x-ndjson"
+        )
+    return SimulationService.sweep_grid(axes)
@@ -1,9 +1,36 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from datetime import datetime, timezone
+
+from sqlalchemy import (
+    Column,
+    Computed,
+    Integer,
+    String,
+    Float,
+    DateTime,
+    ForeignKey,
+    Text,
+    Index,
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from .crud.derived import DERIVED_VALUES_IN_DB, generated_expressions
 from .db import Base
 
 
+def derived_column(name: str) -> Column:
+    if DERIVED_VALUES_IN_DB:
+        return Column(
+            Float,
+            Computed(generated_expressions()[name], persisted=True),
+            nullable=False,
+        )
+    return Column(Float, nullable=False)
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -27,6 +54,51 @@ class Simulation(Base):
     down_payment_percentage = Column(Float, nullable=False)
     contract_years = Column(Integer, nullable=False)
 
+    # Computed by the app on write, or generated by the database; see crud.derived
+    down_payment_amount = derived_column("down_payment_amount")
+    financing_amount = derived_column("financing_amount")
+    total_to_save = derived_column("total_to_save")
+    monthly_savings = derived_column("monthly_savings")
+
+    property_address = Column(Text, nullable=True)
+    property_type = Column(String, nullable=True)
+    notes = Column(Text, nullable=True)
+
+    # Set by the app as an aware UTC datetime, so every backend stores it with
+    # full precision and the listing cursor compares it exactly
+    created_at = Column(
+        DateTime(timezone=True), default=utcnow, server_default=func.now()
+    )
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    user = relationship("User", back_populates="simulations")
+
+    # On PostgreSQL, migration 005 hash-partitions the table by user_id with
+    # (id, user_id) as the primary key; queries that filter on user_id touch a
+    # single partition, which is why SimulationRepository always does.
+    __table_args__ = (
+        # Serves the per-user listing order and its keyset cursor
+        Index("ix_simulations_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+class SimulationArchive(Base):
+    """Simulations moved out of ``simulations`` by the archival job.
+
+    Kept compact: derived values are plain columns, and besides the primary key
+    the only index is the one used to find a user's archived rows. Ids are the
+    original ones.
+    """
+
+    __tablename__ = "simulations_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(Integer, nullable=False, index=True)
+
+    property_value = Column(Float, nullable=False)
+    down_payment_percentage = Column(Float, nullable=False)
+    contract_years = Column(Integer, nullable=False)
+
     down_payment_amount = Column(Float, nullable=False)
     financing_amount = Column(Float, nullable=False)
     total_to_save = Column(Float, nullable=False)
@@ -36,9 +108,25 @@ class Simulation(Base):
     property_type = Column(String, nullable=True)
     notes = Column(Text, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True))
+    updated_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), server_default=func.now())
 
-    user = relationship("User", back_populates="simulations")
 
+class SimulationStats(Base):
+    """Per-user running totals behind ``/simulations/statistics``.
+
+    Only maintained when the stats rollup is enabled; see
+    ``SimulationRepository`` for how the rows are kept up to date.
+    """
+
+    __tablename__ = "simulation_stats"
 
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    simulation_count = Column(Integer, nullable=False, default=0)
+    total_property_value = Column(Float, nullable=False, default=0)
+    total_down_payment_percentage = Column(Float, nullable=False, default=0)
+    total_contract_years = Column(Integer, nullable=False, default=0)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
@@ -1,7 +1,16 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, Field, EmailStr, model_validator
+from typing import Annotated, Optional, List, Dict
 from datetime import datetime
 
+MAX_CALCULATION_BATCH_SIZE = 50_000
+MAX_SWEEP_CELLS = 1_000_000
+MAX_MONTECARLO_PATHS = 50_000
+MAX_SIMULATION_BATCH_IDS = 1000
+
+# Batch items the vectorized engine cannot take: inf/NaN, int64 overflow
+FiniteFloat = Annotated[float, Field(allow_inf_nan=False)]
+ContractYears = Annotated[int, Field(ge=1, le=30)]
+
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -43,6 +52,85 @@ class SimulationCreate(SimulationBase):
     pass
 
 
+class SimulationBatchCalculate(BaseModel):
+    """Scenarios for ``POST /calculate/batch``, either columnar or as rows.
+
+    Columnar ranges are validated in bulk by the service rather than per
+    element, which is what makes large batches cheap. Per element, only
+    non-finite floats and contract years outside 1..30 (which would not fit
+    an int64) are rejected here.
+    """
+
+    property_value: Optional[List[FiniteFloat]] = Field(
+        None, max_length=MAX_CALCULATION_BATCH_SIZE
+    )
+    down_payment_percentage: Optional[List[FiniteFloat]] = Field(
+        None, max_length=MAX_CALCULATION_BATCH_SIZE
+    )
+    contract_years: Optional[List[ContractYears]] = Field(
+        None, max_length=MAX_CALCULATION_BATCH_SIZE
+    )
+    scenarios: Optional[List[SimulationCreate]] = Field(
+        None, max_length=MAX_CALCULATION_BATCH_SIZE
+    )
+
+    @model_validator(mode="after")
+    def check_shape(self):
+        columns = (
+            self.property_value,
+            self.down_payment_percentage,
+            self.contract_years,
+        )
+        if self.scenarios is not None:
+            if any(column is not None for column in columns):
+                raise ValueError("Send either columnar arrays or scenarios, not both")
+            return self
+        if any(column is None for column in columns):
+            raise ValueError(
+                "property_value, down_payment_percentage and contract_years "
+                "are required"
+            )
+        if len({len(column) for column in columns}) != 1:
+            raise ValueError("Columnar arrays must all have the same length")
+        return self
+
+
+class SimulationBatchCalculateResponse(BaseModel):
+    count: int
+    calculated_values: Dict[str, List[float]]
+
+
+class SweepRange(BaseModel):
+    """Inclusive ``start..stop`` in ``step`` increments; ``start`` alone is fixed."""
+
+    start: float = Field(..., allow_inf_nan=False)
+    stop: Optional[float] = Field(None, allow_inf_nan=False)
+    step: float = Field(1, gt=0, allow_inf_nan=False)
+
+    @model_validator(mode="after")
+    def check_bounds(self):
+        if self.stop is None:
+            self.stop = self.start
+        if self.stop < self.start:
+            raise ValueError("stop must be greater than or equal to start")
+        return self
+
+
+class SimulationSweep(BaseModel):
+    property_value: SweepRange
+    down_payment_percentage: SweepRange
+    contract_years: SweepRange
+
+
+class SimulationSweepResponse(BaseModel):
+    """Grid results flattened in C order: ``contract_years`` varies fastest."""
+
+    count: int
+    shape: List[int]
+    axes: Dict[str, List[float]]
+    calculated_values: Dict[str, List[float]]
+
+
 class SimulationUpdate(BaseModel):
     property_value: Optional[float] = Field(None, gt=0)
     down_payment_percentage: Optional[float] = Field(None, ge=0, le=100)
@@ -52,6 +140,46 @@ class SimulationUpdate(BaseModel):
     notes: Optional[str] = None
 
 
+class SimulationBatchUpdateItem(SimulationUpdate):
+    id: int
+
+    @model_validator(mode="after")
+    def check_inputs_not_null(self):
+        for field in ("property_value", "down_payment_percentage", "contract_years"):
+            if field in self.model_fields_set and getattr(self, field) is None:
+                raise ValueError(f"{field} cannot be null")
+        return self
+
+
+class SimulationBatchUpdate(BaseModel):
+    """Partial updates for ``PATCH /simulations/batch``, one per simulation id."""
+
+    updates: List[SimulationBatchUpdateItem] = Field(
+        ..., min_length=1, max_length=MAX_SIMULATION_BATCH_IDS
+    )
+
+    @model_validator(mode="after")
+    def check_unique_ids(self):
+        if len({item.id for item in self.updates}) != len(self.updates):
+            raise ValueError("Each simulation id may appear only once")
+        return self
+
+
+class SimulationBatchDelete(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_SIMULATION_BATCH_IDS)
+
+
+class SimulationBatchItemResult(BaseModel):
+    id: int
+    status: str  # "updated", "deleted" or "not_found"
+
+
+class SimulationBatchResult(BaseModel):
+    processed: int
+    not_found: int
+    results: List[SimulationBatchItemResult]
+
+
 class Simulation(SimulationBase):
     id: int
     user_id: int
@@ -82,7 +210,36 @@ class SimulationResponse(BaseModel):
 
 class SimulationsListResponse(BaseModel):
     simulations: List[Simulation]
-    total: int
+    total: Optional[int] = None
+    next_cursor: Optional[str] = None
+
+
+class AmortizationSchedule(BaseModel):
+    simulation_id: int
+    system: str
+    annual_interest_rate: float
+    monthly_interest_rate: float
+    granularity: str
+    financing_amount: float
+    periods: int
+    total_paid: float
+    total_interest: float
+    payment: List[float]
+    interest: List[float]
+    amortization: List[float]
+    balance: List[float]
+
+
+class SimulationImportError(BaseModel):
+    line: int
+    errors: List[str]
+
+
+class SimulationImportResponse(BaseModel):
+    imported: int
+    failed: int
+    errors: List[SimulationImportError]
+    errors_truncated: bool
 
 
 class UserSimulationsResponse(BaseModel):
@@ -91,3 +248,34 @@ class UserSimulationsResponse(BaseModel):
     total: int
 
 
+class MonteCarloRequest(BaseModel):
+    """Stochastic assumptions for ``POST /simulations/{id}/montecarlo``.
+
+    Rates and growth figures are annual percentages; the interest volatility
+    is in percentage points per year.
+    """
+
+    paths: int = Field(10_000, ge=100, le=MAX_MONTECARLO_PATHS)
+    seed: Optional[int] = Field(None, ge=0, le=2**32 - 1)
+    annual_interest_rate: float = Field(..., ge=0, le=100)
+    long_run_interest_rate: Optional[float] = Field(None, ge=0, le=100)
+    interest_rate_volatility: float = Field(1.5, ge=0, le=50)
+    interest_rate_mean_reversion: float = Field(0.3, ge=0, le=10)
+    monthly_income: float = Field(..., gt=0)
+    income_growth: float = Field(3.0, ge=-50, le=50)
+    income_volatility: float = Field(10.0, ge=0, le=100)
+    income_rate_correlation: float = Field(0.0, ge=-1, le=1)
+    affordability_threshold: float = Field(30.0, gt=0, le=100)
+
+
+class MonteCarloResult(BaseModel):
+    """Percentile bands per contract year end (``years``), keyed ``p5`` .. ``p95``."""
+
+    simulation_id: int
+    paths: int
+    seed: int
+    years: List[int]
+    bands: Dict[str, Dict[str, List[float]]]
+    total_interest: Dict[str, float]
+    probability_unaffordable: float
+    probability_savings_target: float
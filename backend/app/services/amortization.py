@@ -0,0 +1,99 @@
+import numpy as np
+
+from .calculations import round2
+
+AMORTIZATION_SYSTEMS = ("sac", "price")
+SCHEDULE_GRANULARITIES = ("month", "year")
+MAX_PERIODS = 360
+
+
+def monthly_rate(annual_interest_rate):
+    """Effective monthly rate equivalent to an effective annual percentage rate."""
+    annual = np.asarray(annual_interest_rate, dtype=np.float64) / 100
+    return np.power(1 + annual, 1 / 12) - 1
+
+
+def amortization_schedule(principal, annual_interest_rate, months, system: str) -> dict:
+    """Month-by-month schedules for many loans at once.
+
+    ``principal``, ``annual_interest_rate`` (percent) and ``months`` broadcast
+    to one value per scenario. Returns 2-D arrays shaped
+    ``(scenarios, max(months))`` for payment, interest, amortization and the
+    balance left after each payment; periods past a scenario's term are zero.
+
+    SAC repays a constant share of principal each month, so payments fall
+    over time; PRICE keeps the payment constant (French / annuity system).
+    Both are evaluated in closed form, without a per-month Python loop.
+    """
+    principal, rate, months = np.broadcast_arrays(
+        np.atleast_1d(np.asarray(principal, dtype=np.float64)),
+        np.atleast_1d(monthly_rate(annual_interest_rate)),
+        np.atleast_1d(np.asarray(months, dtype=np.int64)),
+    )
+    if months.size and (months.min() < 1 or months.max() > MAX_PERIODS):
+        raise ValueError(f"Terms must be between 1 and {MAX_PERIODS} months")
+
+    period = np.arange(1, months.max() + 1, dtype=np.float64)[None, :]
+    principal, rate, n = (
+        principal[:, None],
+        rate[:, None],
+        months[:, None].astype(np.float64),
+    )
+    active = period <= n
+
+    if system == "sac":
+        amortization = np.broadcast_to(principal / n, active.shape)
+        balance = principal - amortization * period
+    elif system == "price":
+        growth = np.power(1 + rate, period)
+        zero_rate = rate == 0
+        safe_rate = np.where(zero_rate, 1.0, rate)
+        installment = np.where(
+            zero_rate,
+            principal / n,
+            principal * safe_rate / (1 - np.power(1 + safe_rate, -n)),
+        )
+        balance = np.where(
+            zero_rate,
+            principal - installment * period,
+            principal * growth - installment * (growth - 1) / safe_rate,
+        )
+    else:
+        raise ValueError(f"Unknown amortization system: {system}")
+
+    balance_before = np.concatenate([principal, balance[:, :-1]], axis=1)
+    interest = balance_before * rate
+    if system == "sac":
+        payment = amortization + interest
+    else:
+        payment = np.broadcast_to(installment, active.shape)
+        amortization = payment - interest
+
+    # The last payment settles the loan exactly; closed forms leave float dust
+    balance = np.where(period >= n, 0.0, balance)
+    return {
+        "payment": np.where(active, payment, 0.0),
+        "interest": np.where(active, interest, 0.0),
+        "amortization": np.where(active, amortization, 0.0),
+        "balance": np.where(active, balance, 0.0),
+    }
+
+
+def aggregate_by_year(schedule: dict, months: int) -> dict:
+    """Collapse one scenario's monthly schedule into contract years."""
+    years = -(-months // 12)
+    padded = {
+        name: np.pad(values[:months], (0, years * 12 - months)).reshape(years, 12)
+        for name, values in schedule.items()
+    }
+    last_month = np.minimum(np.arange(1, years + 1) * 12, months) - 1
+    return {
+        "payment": padded["payment"].sum(axis=1),
+        "interest": padded["interest"].sum(axis=1),
+        "amortization": padded["amortization"].sum(axis=1),
+        "balance": schedule["balance"][last_month],
+    }
+
+
+def rounded(schedule: dict) -> dict:
+    return {name: round2(values).tolist() for name, values in schedule.items()}
@@ -0,0 +1,189 @@
+import gzip
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import bindparam, column, delete, insert, select, table, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from .. import models
+from ..crud import simulations as simulation_crud
+from .serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_BATCH_SIZE = 5000
+# Archived rows keep every column the hot table has, generated ones included
+ARCHIVE_COLUMNS = [c.name for c in models.Simulation.__table__.columns]
+
+
+def partition_tables(conn: Connection) -> list[str]:
+    """The partitions of ``simulations`` (migration 005), or the table itself."""
+    if conn.dialect.name != "postgresql":
+        return [models.Simulation.__tablename__]
+    names = conn.scalars(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent ORDER BY child.relname"
+        ),
+        {"parent": models.Simulation.__tablename__},
+    ).all()
+    return list(names) or [models.Simulation.__tablename__]
+
+
+def source_table(name: str):
+    """A partition addressed directly, so no statement has to be routed or pruned."""
+    return table(
+        name, *(column(c.name, c.type) for c in models.Simulation.__table__.columns)
+    )
+
+
+def release_stats(conn: Connection, rows: list[dict]) -> None:
+    """Take archived rows out of the users' statistics rollups, when maintained."""
+    if not simulation_crud.STATS_ROLLUP_ENABLED:
+        return
+    totals = defaultdict(lambda: [0, 0.0, 0.0, 0])
+    for row in rows:
+        user_totals = totals[row["user_id"]]
+        user_totals[0] += 1
+        user_totals[1] += row["property_value"]
+        user_totals[2] += row["down_payment_percentage"]
+        user_totals[3] += row["contract_years"]
+
+    stats = models.SimulationStats.__table__
+    conn.execute(
+        update(stats)
+        .where(stats.c.user_id == bindparam("_user_id"))
+        .values(
+            simulation_count=stats.c.simulation_count - bindparam("_count"),
+            total_property_value=(
+                stats.c.total_property_value - bindparam("_property_value")
+            ),
+            total_down_payment_percentage=(
+                stats.c.total_down_payment_percentage
+                - bindparam("_down_payment_percentage")
+            ),
+            total_contract_years=(
+                stats.c.total_contract_years - bindparam("_contract_years")
+            ),
+        ),
+        [
+            {
+                "_user_id": user_id,
+                "_count": count,
+                "_property_value": property_value,
+                "_down_payment_percentage": down_payment,
+                "_contract_years": contract_years,
+            }
+            for user_id, (count, property_value, down_payment, contract_years)
+            in totals.items()
+        ],
+    )
+
+
+def write_archive_file(directory: str, partition: str, rows: list[dict]) -> str:
+    """Write ``rows`` to ``directory`` as one complete gzipped NDJSON file.
+
+    The file is fsynced under a temporary name and then renamed into place,
+    so every ``*.ndjson.gz`` there is whole and readable on its own. Its name
+    comes from the ids it holds, so a batch archived again after a crash
+    overwrites its earlier copy instead of adding another.
+    """
+    path = os.path.join(
+        directory, f"{partition}-{rows[0]['id']}-{rows[-1]['id']}.ndjson.gz"
+    )
+    partial = path + ".partial"
+    with open(partial, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as archive_file:
+            archive_file.write(b"".join(dumps(row) + b"\n" for row in rows))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    directory_fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+    return path
+
+
+def archive_batch(
+    conn: Connection,
+    partition: str,
+    cutoff: datetime,
+    batch_size: int,
+    archive_dir: str | None = None,
+) -> int:
+    """Move up to ``batch_size`` rows created before ``cutoff`` out of ``partition``.
+
+    Rows go to ``simulations_archive``, or to a new file in ``archive_dir``
+    (durable on disk before the DELETE commits, so a crash can only leave a
+    row in both places, never in neither). Returns the number of rows moved.
+    """
+    source = source_table(partition)
+    rows = [
+        dict(row)
+        for row in conn.execute(
+            select(*(source.c[name] for name in ARCHIVE_COLUMNS))
+            .where(source.c.created_at < cutoff)
+            .order_by(source.c.id)
+            .limit(batch_size)
+        ).mappings()
+    ]
+    if not rows:
+        return 0
+
+    if archive_dir is None:
+        conn.execute(insert(models.SimulationArchive), rows)
+    else:
+        write_archive_file(archive_dir, partition, rows)
+    conn.execute(delete(source).where(source.c.id.in_([row["id"] for row in rows])))
+    release_stats(conn, rows)
+    return len(rows)
+
+
+def archive_simulations(
+    engine: Engine,
+    cutoff: datetime,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+    archive_dir: str | None = None,
+) -> dict:
+    """Move every simulation created before ``cutoff`` out of the hot table.
+
+    Works one partition at a time, in batches that each commit on their own,
+    so the job can be stopped and rerun at any point: whatever is left is
+    still older than the cutoff. With ``archive_dir`` each batch becomes a
+    gzipped NDJSON file there instead of rows in the archive table. Returns
+    rows moved per partition.
+    """
+    with engine.connect() as conn:
+        partitions = partition_tables(conn)
+    if archive_dir is not None:
+        os.makedirs(archive_dir, exist_ok=True)
+
+    moved = {}
+    started = time.perf_counter()
+    for partition in partitions:
+        moved[partition] = 0
+        while True:
+            with engine.begin() as conn:
+                count = archive_batch(conn, partition, cutoff, batch_size, archive_dir)
+            if not count:
+                break
+            moved[partition] += count
+        logger.info("Archived %d rows from %s", moved[partition], partition)
+
+    elapsed = time.perf_counter() - started
+    total = sum(moved.values())
+    logger.info(
+        "Archived %d simulations created before %s in %.1f s (%.0f rows/s)",
+        total,
+        cutoff.isoformat(),
+        elapsed,
+        total / elapsed if elapsed else 0,
+    )
+    return moved
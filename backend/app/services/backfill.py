@@ -0,0 +1,169 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.engine import Connection, Engine
+
+from .. import models
+from ..crud.derived import DERIVED_FIELDS, DERIVED_VALUES_IN_DB, derived_values_sql
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_CHUNK_SIZE = 5000
+BACKFILL_ROWS_PER_SECOND = 20000
+
+
+def load_checkpoint(path: str) -> dict:
+    """Progress saved by a previous run, or a fresh state when there is none."""
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_id": 0, "rows_scanned": 0, "rows_updated": 0, "completed": False}
+
+
+def save_checkpoint(path: str, state: dict) -> None:
+    # Write then rename, so an interruption never leaves a half-written file
+    state = {
+        **state,
+        "saved_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def recompute_chunk(
+    conn: Connection, after_id: int, chunk_size: int
+) -> tuple[int | None, int, int]:
+    """Recompute derived values for the ``chunk_size`` simulations after ``after_id``.
+
+    The chunk is an id range found through the primary key, so each step is a
+    short index scan however far the job has got. One UPDATE then rewrites the
+    rows in the range whose stored values differ from the current formula, and
+    leaves the rest (and their ``updated_at``) alone. Returns the last id of
+    the chunk (None when no rows are left), the rows in it and the rows updated.
+    """
+    sim = models.Simulation
+    scanned = chunk_size
+    upper = conn.scalar(
+        select(sim.id)
+        .where(sim.id > after_id)
+        .order_by(sim.id)
+        .offset(chunk_size - 1)
+        .limit(1)
+    )
+    if upper is None:
+        # Final, partial chunk
+        upper, scanned = conn.execute(
+            select(func.max(sim.id), func.count()).where(sim.id > after_id)
+        ).one()
+        if upper is None:
+            return None, 0, 0
+
+    expressions = derived_values_sql(
+        sim.property_value, sim.down_payment_percentage, sim.contract_years
+    )
+    result = conn.execute(
+        update(sim)
+        .where(sim.id > after_id, sim.id <= upper)
+        .where(
+            or_(*(getattr(sim, name) != expressions[name] for name in DERIVED_FIELDS))
+        )
+        .values(expressions)
+    )
+    return upper, scanned, result.rowcount
+
+
+def run_backfill(
+    engine: Engine,
+    checkpoint_path: str,
+    chunk_size: int = BACKFILL_CHUNK_SIZE,
+    rows_per_second: float = BACKFILL_ROWS_PER_SECOND,
+    max_chunks: int | None = None,
+    restart: bool = False,
+) -> dict:
+    """Bring every stored derived value in line with the current formula.
+
+    Walks the table in id order, one committed chunk at a time, saving the
+    last id done to ``checkpoint_path`` after each commit; a later run picks
+    up from there. Sleeps between chunks to average at most
+    ``rows_per_second`` rows (0 disables the throttle). Stops after
+    ``max_chunks`` chunks when given. Returns the final checkpoint state.
+    """
+    if DERIVED_VALUES_IN_DB:
+        raise RuntimeError(
+            "Derived values are generated by the database (SIMULATION_DERIVED_IN_DB); "
+            "there is nothing to backfill"
+        )
+
+    state = load_checkpoint(None if restart else checkpoint_path)
+    if state["completed"]:
+        logger.info(
+            "Checkpoint %s is already complete; restart to run again", checkpoint_path
+        )
+        return state
+
+    with engine.connect() as conn:
+        max_id = conn.scalar(select(func.max(models.Simulation.id))) or 0
+    logger.info(
+        "Recomputing derived values after id %d (max id %d), %d rows per chunk",
+        state["last_id"],
+        max_id,
+        chunk_size,
+    )
+
+    started = time.perf_counter()
+    scanned = updated = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        with engine.begin() as conn:
+            last_id, chunk_rows, chunk_updated = recompute_chunk(
+                conn, state["last_id"], chunk_size
+            )
+        if last_id is None:
+            state["completed"] = True
+            save_checkpoint(checkpoint_path, state)
+            break
+
+        state["last_id"] = last_id
+        state["rows_scanned"] += chunk_rows
+        state["rows_updated"] += chunk_updated
+        save_checkpoint(checkpoint_path, state)
+        scanned += chunk_rows
+        updated += chunk_updated
+        chunks += 1
+
+        elapsed = time.perf_counter() - started
+        if rows_per_second:
+            # Sleep off any lead over the target average rate
+            ahead = scanned / rows_per_second - elapsed
+            if ahead > 0:
+                time.sleep(ahead)
+                elapsed += ahead
+        logger.info(
+            "Chunk up to id %d (%.1f%%): %d rows, %d updated; %.0f rows/s",
+            last_id,
+            100 * last_id / max_id if max_id else 100,
+            chunk_rows,
+            chunk_updated,
+            scanned / elapsed if elapsed else 0,
+        )
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        "%s: %d rows scanned, %d updated in %.1f s (%.0f rows/s)",
+        "Backfill complete" if state["completed"] else "Backfill paused",
+        scanned,
+        updated,
+        elapsed,
+        scanned / elapsed if elapsed else 0,
+    )
+    return {
+        **state,
+        "run_rows_scanned": scanned,
+        "run_rows_updated": updated,
+        "run_seconds": elapsed,
+    }
@@ -0,0 +1,82 @@
+import numpy as np
+
+SAVINGS_RATE = 0.15
+
+# From 2**52 up every double is a whole number, so there are no cents to round,
+# and scaling by 100 could overflow to inf
+WHOLE_NUMBERS_FROM = 2.0**52
+
+
+def round2(values):
+    """Round to cents the same way for scalars and arrays.
+
+    This is NumPy's ``rint(x * 100) / 100``, half to even on the scaled
+    value, and the database twin in ``crud.derived`` does the same. It is not
+    Python's ``round(x, 2)``, which rounds the exact binary value: for a
+    near-tie such as ``2.675`` (stored as ``2.67499999...``) ``round`` gives
+    ``2.67`` and this gives ``2.68``.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    whole = ~(np.abs(values) < WHOLE_NUMBERS_FROM)
+    return np.where(whole, values, np.round(np.where(whole, 0.0, values), 2))
+
+
+def derive_values(property_value, down_payment_percentage, contract_years):
+    """Compute the derived simulation columns for one scenario or many at once.
+
+    Inputs may be Python scalars or NumPy arrays of matching shape; the same
+    float64 operations run in both cases, so a scenario computed alone is
+    bit-for-bit identical to the same scenario computed inside a batch.
+    """
+    property_value = np.asarray(property_value, dtype=np.float64)
+    down_payment_percentage = np.asarray(down_payment_percentage, dtype=np.float64)
+    contract_years = np.asarray(contract_years, dtype=np.int64)
+
+    down_payment_amount = property_value * (down_payment_percentage / 100)
+    financing_amount = property_value - down_payment_amount
+    total_to_save = property_value * SAVINGS_RATE
+    monthly_savings = total_to_save / (contract_years * 12)
+
+    return {
+        "down_payment_amount": round2(down_payment_amount),
+        "financing_amount": round2(financing_amount),
+        "total_to_save": round2(total_to_save),
+        "monthly_savings": round2(monthly_savings),
+    }
+
+
+def sweep_axis(start: float, stop: float, step: float, dtype=np.float64) -> np.ndarray:
+    """Inclusive ``start..stop`` range; ``stop`` is kept when the steps land on it.
+
+    Points are ``start + i * step`` rather than an accumulated sum, so long
+    axes do not drift (``0.1`` steps stay exact to the cent).
+    """
+    count = axis_length(start, stop, step)
+    return (start + np.arange(count) * step).astype(dtype)
+
+
+def axis_length(
+    start: float, stop: float, step: float, limit: int | None = None
+) -> int:
+    """Points in ``start..stop``; with ``limit``, longer axes count as ``limit + 1``."""
+    steps = (stop - start) / step
+    # Checked before int(): finite inputs can still overflow to inf here
+    if limit is not None and not steps < limit:
+        return limit + 1
+    # The epsilon keeps 0.3 / 0.1 from rounding down to 2 steps
+    return int(np.floor(steps + 1e-9)) + 1
+
+
+def grid_chunks(axes: list[np.ndarray], chunk_size: int):
+    """Yield ``(offset, derived_values)`` over the cartesian product of ``axes``.
+
+    Cells are in C order (last axis varies fastest) and are materialized one
+    chunk at a time, so memory stays bounded however large the grid is.
+    """
+    shape = tuple(len(axis) for axis in axes)
+    cells = int(np.prod(shape))
+    for offset in range(0, cells, chunk_size):
+        index = np.unravel_index(
+            np.arange(offset, min(offset + chunk_size, cells)), shape
+        )
+        yield offset, derive_values(*(axis[i] for axis, i in zip(axes, index)))
@@ -0,0 +1,50 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from .. import models
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+    models.Simulation.id,
+    models.Simulation.property_value,
+    models.Simulation.down_payment_percentage,
+    models.Simulation.contract_years,
+    models.Simulation.down_payment_amount,
+    models.Simulation.financing_amount,
+    models.Simulation.total_to_save,
+    models.Simulation.monthly_savings,
+    models.Simulation.property_address,
+    models.Simulation.property_type,
+    models.Simulation.notes,
+    models.Simulation.created_at,
+    models.Simulation.updated_at,
+]
+EXPORT_FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def csv_header() -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(EXPORT_FIELDS)
+    return buffer.getvalue()
+
+
+def csv_rows(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows([_plain(value) for value in row] for row in rows)
+    return buffer.getvalue()
+
+
+def ndjson_rows(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, map(_plain, row))), ensure_ascii=False)
+        + "\n"
+        for row in rows
+    )
@@ -0,0 +1,90 @@
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from ..crud.derived import DERIVED_FIELDS
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL expressions of the generated derived columns, frozen as the
+# literal text ``generated_expressions()`` compiles to, so the DDL reads as it
+# runs; a test keeps the two in step. Each is ``round2`` of the formula.
+GENERATED_SQL = {
+    "down_payment_amount": (
+        "(CASE WHEN abs(property_value * (down_payment_percentage / "
+        "CAST(100.0 AS FLOAT))) < 4503599627370496.0 "
+        "THEN round((property_value * (down_payment_percentage / "
+        "CAST(100.0 AS FLOAT))) * 100) / 100 "
+        "ELSE property_value * (down_payment_percentage / CAST(100.0 AS FLOAT)) END)"
+    ),
+    "financing_amount": (
+        "(CASE WHEN abs(property_value - property_value * (down_payment_percentage "
+        "/ CAST(100.0 AS FLOAT))) < 4503599627370496.0 "
+        "THEN round((property_value - property_value * (down_payment_percentage "
+        "/ CAST(100.0 AS FLOAT))) * 100) / 100 "
+        "ELSE property_value - property_value * (down_payment_percentage "
+        "/ CAST(100.0 AS FLOAT)) END)"
+    ),
+    "total_to_save": (
+        "(CASE WHEN abs(property_value * 0.15) < 4503599627370496.0 "
+        "THEN round((property_value * 0.15) * 100) / 100 "
+        "ELSE property_value * 0.15 END)"
+    ),
+    "monthly_savings": (
+        "(CASE WHEN abs((property_value * 0.15) / CAST((contract_years * 12) "
+        "AS NUMERIC)) < 4503599627370496.0 "
+        "THEN round(((property_value * 0.15) / CAST((contract_years * 12) "
+        "AS NUMERIC)) * 100) / 100 "
+        "ELSE (property_value * 0.15) / CAST((contract_years * 12) AS NUMERIC) END)"
+    ),
+}
+
+
+def generated_columns(conn: Connection) -> list[str]:
+    """The derived columns of ``simulations`` the database currently generates."""
+    names = conn.scalars(
+        text(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = 'simulations' "
+            "AND is_generated = 'ALWAYS'"
+        )
+    ).all()
+    return [name for name in DERIVED_FIELDS if name in names]
+
+
+def generate_derived_columns(engine: Engine) -> bool:
+    """Turn the derived columns into stored generated columns (PostgreSQL).
+
+    A regular column cannot become a generated one in place, so they are all
+    dropped and re-added in a single ALTER: the table is rewritten once, not
+    four times, under an exclusive lock. Returns False if already converted.
+    """
+    with engine.begin() as conn:
+        if generated_columns(conn):
+            logger.info("Derived columns are already generated by the database")
+            return False
+        clauses = [f"DROP COLUMN {name}" for name in DERIVED_FIELDS] + [
+            f"ADD COLUMN {name} DOUBLE PRECISION GENERATED ALWAYS AS ("
+            f"{GENERATED_SQL[name]}) STORED NOT NULL"
+            for name in DERIVED_FIELDS
+        ]
+        conn.execute(text(f"ALTER TABLE simulations {', '.join(clauses)}"))
+    logger.info("Derived columns are now generated by the database")
+    return True
+
+
+def store_derived_columns(engine: Engine) -> bool:
+    """Turn generated derived columns back into regular ones, keeping their values.
+
+    Returns False if there was nothing to revert.
+    """
+    with engine.begin() as conn:
+        names = generated_columns(conn)
+        if not names:
+            logger.info("Derived columns are already stored by the app")
+            return False
+        clauses = [f"ALTER COLUMN {name} DROP EXPRESSION" for name in names]
+        conn.execute(text(f"ALTER TABLE simulations {', '.join(clauses)}"))
+    logger.info("Derived columns are now stored by the app")
+    return True
@@ -0,0 +1,105 @@
+import csv
+import io
+import json
+from typing import BinaryIO, Iterator, Optional
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+
+from .. import schemas
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Rows validated, derived and inserted per transaction; bounds memory per upload.
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+
+def detect_format(
+    fmt: Optional[str], filename: Optional[str], content_type: Optional[str]
+) -> str:
+    if fmt:
+        return fmt
+    name = (filename or "").lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in (
+        "application/x-ndjson",
+        "application/jsonl",
+    ):
+        return "ndjson"
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Could not infer the file format; pass format=csv or format=ndjson",
+    )
+
+
+def iter_rows(stream: BinaryIO, fmt: str) -> Iterator[tuple[int, dict | str]]:
+    """Yield ``(line_number, row)`` lazily; ``row`` is an error message if invalid."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            yield from _iter_csv_rows(text)
+        else:
+            yield from _iter_ndjson_rows(text)
+    except UnicodeDecodeError:
+        yield 0, "File is not valid UTF-8 text; rows after this point were not read"
+
+
+def _iter_csv_rows(text: io.TextIOWrapper) -> Iterator[tuple[int, dict | str]]:
+    reader = csv.DictReader(text)
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            yield reader.line_num, f"Invalid CSV: {exc}"
+            continue
+        # Empty cells mean "not provided", like an absent key in NDJSON
+        yield reader.line_num, {
+            key: value for key, value in row.items() if key is not None and value != ""
+        }
+
+
+def _iter_ndjson_rows(text: io.TextIOWrapper) -> Iterator[tuple[int, dict | str]]:
+    for line_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, "Each line must be a JSON object"
+            continue
+        yield line_number, row
+
+
+def read_chunk(
+    rows: Iterator[tuple[int, dict | str]], size: int
+) -> tuple[list[tuple[int, schemas.SimulationCreate]], list[dict], bool]:
+    """Validate up to ``size`` rows; return ``(valid, errors, exhausted)``."""
+    valid, errors = [], []
+    for line_number, row in rows:
+        if isinstance(row, str):
+            errors.append({"line": line_number, "errors": [row]})
+        else:
+            try:
+                valid.append(
+                    (line_number, schemas.SimulationCreate.model_validate(row))
+                )
+            except ValidationError as exc:
+                errors.append(
+                    {
+                        "line": line_number,
+                        "errors": [
+                            f"{'.'.join(map(str, err['loc']))}: {err['msg']}"
+                            for err in exc.errors()
+                        ],
+                    }
+                )
+        if len(valid) + len(errors) >= size:
+            return valid, errors, False
+    return valid, errors, True
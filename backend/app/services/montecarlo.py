@@ -0,0 +1,181 @@
+import multiprocessing
+import os
+import secrets
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+
+import numpy as np
+
+from .amortization import monthly_rate
+from .calculations import round2
+
+PERCENTILES = (5, 25, 50, 75, 95)
+SNAPSHOT_METRICS = (
+    "annual_interest_rate",
+    "payment",
+    "payment_to_income",
+    "balance",
+    "savings",
+)
+
+# Paths are generated in fixed-size blocks, each with its own child seed, so a
+# given seed yields the same paths whether blocks run inline or in any number
+# of worker processes.
+BLOCK_PATHS = 2048
+
+MONTECARLO_WORKERS = int(os.getenv("MONTECARLO_WORKERS", str(os.cpu_count() or 1)))
+# Smaller jobs run inline: process start-up and pickling would cost more than they save
+MONTECARLO_PARALLEL_MIN_PATHS = int(os.getenv("MONTECARLO_PARALLEL_MIN_PATHS", "20000"))
+
+# The pool starts lazily inside a running, threaded server. Forking there would
+# copy held locks, the hashing thread pool and open database sockets into the
+# workers, so they are spawned as fresh interpreters instead.
+MONTECARLO_START_METHOD = "spawn"
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> Executor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=MONTECARLO_WORKERS,
+                mp_context=multiprocessing.get_context(MONTECARLO_START_METHOD),
+            )
+        return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def new_seed() -> int:
+    # 32 bits so the seed echoed back survives a round trip through JavaScript numbers
+    return secrets.randbits(32)
+
+
+def plan_blocks(paths: int, seed: int) -> list[tuple[np.random.SeedSequence, int]]:
+    sizes = [BLOCK_PATHS] * (paths // BLOCK_PATHS)
+    if paths % BLOCK_PATHS:
+        sizes.append(paths % BLOCK_PATHS)
+    return list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+
+def simulate_block(
+    params: dict, seed_sequence: np.random.SeedSequence, paths: int
+) -> dict:
+    """Simulate ``paths`` loan/income paths month by month, vectorized across paths.
+
+    Interest follows a mean-reverting (Vasicek) walk on the annual rate, floored
+    at zero; the loan is a floating-rate PRICE loan whose installment is
+    recomputed from the remaining balance whenever the rate moves. Income is a
+    geometric Brownian motion, and savings contributions scale with income and
+    earn the path's rate. Returns per-path snapshots at each contract year end.
+    """
+    rng = np.random.default_rng(seed_sequence)
+    months = params["months"]
+    dt = 1 / 12
+    sqrt_dt = np.sqrt(dt)
+
+    shocks = rng.standard_normal((months, 2, paths))
+    rho = params["correlation"]
+    rate_shocks = shocks[:, 0]
+    income_shocks = rho * shocks[:, 0] + np.sqrt(1 - rho**2) * shocks[:, 1]
+
+    rate = np.full(paths, params["annual_interest_rate"])
+    log_income = np.zeros(paths)
+    balance = np.full(paths, params["financing_amount"])
+    savings = np.zeros(paths)
+    total_interest = np.zeros(paths)
+    max_ratio = np.zeros(paths)
+
+    income_drift = (
+        params["income_growth"] - 0.5 * params["income_volatility"] ** 2
+    ) * dt
+    years = months // 12
+    snapshots = {name: np.empty((paths, years)) for name in SNAPSHOT_METRICS}
+
+    for month in range(months):
+        rate = np.maximum(
+            rate
+            + params["mean_reversion"] * (params["long_run_interest_rate"] - rate) * dt
+            + params["interest_rate_volatility"] * sqrt_dt * rate_shocks[month],
+            0.0,
+        )
+        log_income += (
+            income_drift + params["income_volatility"] * sqrt_dt * income_shocks[month]
+        )
+        income = params["monthly_income"] * np.exp(log_income)
+
+        m = monthly_rate(rate)
+        remaining = months - month
+        safe_m = np.where(m == 0, 1.0, m)
+        payment = np.where(
+            m == 0,
+            balance / remaining,
+            balance * safe_m / (1 - np.power(1 + safe_m, -remaining)),
+        )
+        interest = balance * m
+        balance = balance - (payment - interest)
+        total_interest += interest
+        ratio = payment / income * 100
+        max_ratio = np.maximum(max_ratio, ratio)
+        savings = savings * (1 + m) + params["monthly_savings"] * np.exp(log_income)
+
+        if month % 12 == 11:
+            year = month // 12
+            snapshots["annual_interest_rate"][:, year] = rate
+            snapshots["payment"][:, year] = payment
+            snapshots["payment_to_income"][:, year] = ratio
+            snapshots["balance"][:, year] = np.where(month == months - 1, 0.0, balance)
+            snapshots["savings"][:, year] = savings
+
+    return {
+        **snapshots,
+        "total_interest": total_interest,
+        "max_payment_to_income": max_ratio,
+    }
+
+
+def run_paths(
+    params: dict, paths: int, seed: int, executor: Executor | None = None
+) -> dict:
+    """Run all blocks, inline or across ``executor``, and concatenate their outputs."""
+    blocks = plan_blocks(paths, seed)
+    if executor is None:
+        results = [
+            simulate_block(params, block_seed, size) for block_seed, size in blocks
+        ]
+    else:
+        results = list(
+            executor.map(
+                simulate_block,
+                [params] * len(blocks),
+                [block_seed for block_seed, _ in blocks],
+                [size for _, size in blocks],
+            )
+        )
+    return {name: np.concatenate([r[name] for r in results]) for name in results[0]}
+
+
+def percentile_bands(values: np.ndarray) -> dict[str, list[float]]:
+    bands = np.percentile(values, PERCENTILES, axis=0)
+    return {f"p{p}": round2(band).tolist() for p, band in zip(PERCENTILES, bands)}
+
+
+def summarize(params: dict, outputs: dict) -> dict:
+    unaffordable = outputs["max_payment_to_income"] > params["affordability_threshold"]
+    return {
+        "bands": {name: percentile_bands(outputs[name]) for name in SNAPSHOT_METRICS},
+        "total_interest": percentile_bands(outputs["total_interest"]),
+        "probability_unaffordable": round(float(unaffordable.mean()), 4),
+        "probability_savings_target": round(
+            float((outputs["savings"][:, -1] >= params["total_to_save"]).mean()), 4
+        ),
+    }
@@ -0,0 +1,44 @@
+import logging
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.engine import Engine
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+
+def rebuild_stats(engine: Engine) -> int:
+    """Recompute every user's statistics rollup from the simulations table.
+
+    Writes made while ``SIMULATION_STATS_ROLLUP`` was off never touch the
+    rollup, so its rows must be rebuilt before they are trusted again. The
+    table is emptied and refilled in one transaction; a writer that already
+    has the flag on either lands before the rebuild reads the simulations, or
+    applies its change on top of the rebuilt row. Returns the users seeded.
+    """
+    sim = models.Simulation
+    stats = models.SimulationStats.__table__
+    totals = select(
+        sim.user_id,
+        func.count(sim.id),
+        func.sum(sim.property_value),
+        func.sum(sim.down_payment_percentage),
+        func.sum(sim.contract_years),
+    ).group_by(sim.user_id)
+    with engine.begin() as conn:
+        conn.execute(delete(stats))
+        seeded = conn.execute(
+            insert(stats).from_select(
+                [
+                    stats.c.user_id,
+                    stats.c.simulation_count,
+                    stats.c.total_property_value,
+                    stats.c.total_down_payment_percentage,
+                    stats.c.total_contract_years,
+                ],
+                totals,
+            )
+        ).rowcount
+    logger.info("Rebuilt statistics rollups for %d users", seeded)
+    return seeded
@@ -0,0 +1,80 @@
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import Text
+
+from .. import models, schemas
+
+# Columns in the order schemas.Simulation declares its fields, so the fast path
+# emits the same JSON, byte for byte, as response_model serialization does.
+LISTING_COLUMNS = [
+    getattr(models.Simulation, name) for name in schemas.Simulation.model_fields
+]
+LISTING_FIELDS = [column.key for column in LISTING_COLUMNS]
+LISTING_VIEWS = ("full", "summary")
+# Unbounded free text; only returned by the summary view when asked for by name
+TEXT_FIELDS = [
+    column.key for column in LISTING_COLUMNS if isinstance(column.type, Text)
+]
+SUMMARY_FIELDS = [name for name in LISTING_FIELDS if name not in TEXT_FIELDS]
+# Always selected: id identifies the row and (created_at, id) is the page cursor
+CURSOR_FIELDS = ("id", "created_at")
+
+
+def dumps(payload) -> bytes:
+    # UTC as "Z", like Pydantic
+    return orjson.dumps(payload, option=orjson.OPT_UTC_Z)
+
+
+def resolve_listing_fields(fields: str | None, view: str) -> list[str] | None:
+    """Fields to return for ``fields=a,b`` / ``view=summary``; None for the ORM view."""
+    if fields:
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested - set(LISTING_FIELDS))
+        if unknown:
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": "Unknown fields",
+                    "unknown": unknown,
+                    "allowed": LISTING_FIELDS,
+                },
+            )
+        return [name for name in LISTING_FIELDS if name in requested or name == "id"]
+    if view == "summary":
+        return SUMMARY_FIELDS
+    return None
+
+
+def listing_columns(fields: list[str]) -> list:
+    """Columns to SELECT for ``fields``, plus the ones the cursor needs."""
+    return [
+        column
+        for column in LISTING_COLUMNS
+        if column.key in fields or column.key in CURSOR_FIELDS
+    ]
+
+
+def listing_json(
+    rows,
+    total: int | None,
+    next_cursor: str | None,
+    fields: list[str] = LISTING_FIELDS,
+    columns: list = LISTING_COLUMNS,
+) -> bytes:
+    """One-pass JSON for a page of row tuples selected with ``columns``.
+
+    Rows come straight from the database, so the response-model validation
+    FastAPI would otherwise run on them is skipped. Only ``fields`` are
+    emitted; cursor columns selected just for paging are left out.
+    """
+    keys = [column.key for column in columns]
+    if keys == fields:
+        simulations = [dict(zip(fields, row)) for row in rows]
+    else:
+        positions = [keys.index(name) for name in fields]
+        simulations = [
+            {name: row[i] for name, i in zip(fields, positions)} for row in rows
+        ]
+    return dumps(
+        {"simulations": simulations, "total": total, "next_cursor": next_cursor}
+    )
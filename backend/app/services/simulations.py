@@ -1,7 +1,56 @@
-from sqlalchemy.orm import Session
-from fastapi import HTTPException, status
+import asyncio
+import hashlib
+import json
+import os
+from typing import AsyncIterator, BinaryIO, Iterator
+
+import numpy as np
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
 from .. import models, schemas
-from ..crud.simulations import SimulationRepository
+from ..core.cache import TTLCache
+from ..crud.derived import DERIVED_VALUES_IN_DB
+from ..crud.simulations import INPUT_FIELDS, SimulationRepository
+from .amortization import (
+    aggregate_by_year,
+    amortization_schedule,
+    monthly_rate,
+    rounded,
+)
+from .calculations import axis_length, derive_values, grid_chunks, sweep_axis
+from .exports import (
+    EXPORT_BATCH_SIZE,
+    EXPORT_COLUMNS,
+    csv_header,
+    csv_rows,
+    ndjson_rows,
+)
+from . import montecarlo
+from .imports import IMPORT_CHUNK_SIZE, MAX_REPORTED_ERRORS, iter_rows, read_chunk
+
+# Schedules keyed on the simulation's inputs and updated_at, so any edit misses
+SCHEDULE_CACHE_SIZE = int(os.getenv("SCHEDULE_CACHE_SIZE", "1024"))
+SCHEDULE_CACHE_TTL_SECONDS = float(os.getenv("SCHEDULE_CACHE_TTL_SECONDS", "3600"))
+schedule_cache = TTLCache(maxsize=SCHEDULE_CACHE_SIZE, ttl=SCHEDULE_CACHE_TTL_SECONDS)
+
+# Public /calculate responses keyed on normalized inputs; results never go stale,
+# the TTL only bounds how long a rarely-used entry can pin memory.
+CALCULATE_CACHE_SIZE = int(os.getenv("CALCULATE_CACHE_SIZE", "4096"))
+CALCULATE_CACHE_TTL_SECONDS = float(os.getenv("CALCULATE_CACHE_TTL_SECONDS", "3600"))
+calculate_cache = TTLCache(
+    maxsize=CALCULATE_CACHE_SIZE, ttl=CALCULATE_CACHE_TTL_SECONDS
+)
+
+# Grids above this many cells are streamed as NDJSON chunks of this many cells
+SWEEP_CHUNK_CELLS = int(os.getenv("SWEEP_CHUNK_CELLS", "50000"))
+SWEEP_AXES = ("property_value", "down_payment_percentage", "contract_years")
+
+# What a batch update reads (and locks) before writing: the current inputs, to
+# merge with the new ones for derived values and for the statistics delta
+BATCH_UPDATE_COLUMNS = [
+    getattr(models.Simulation, name) for name in ("id", *INPUT_FIELDS)
+]
 
 
 class SimulationService:
@@ -10,68 +59,493 @@ class SimulationService:
     def calculate_simulation_values(
         property_value: float, down_payment_percentage: float, contract_years: int
     ):
-        down_payment_amount = property_value * (down_payment_percentage / 100)
-        financing_amount = property_value - down_payment_amount
-        total_to_save = property_value * 0.15
-        monthly_savings = total_to_save / (contract_years * 12)
+        calculated = derive_values(
+            property_value, down_payment_percentage, contract_years
+        )
+        return {name: float(value) for name, value in calculated.items()}
 
-        return {
-            "down_payment_amount": round(down_payment_amount, 2),
-            "financing_amount": round(financing_amount, 2),
-            "total_to_save": round(total_to_save, 2),
-            "monthly_savings": round(monthly_savings, 2),
+    @staticmethod
+    def calculate_cached(
+        property_value: float, down_payment_percentage: float, contract_years: int
+    ) -> tuple[dict, str]:
+        """Return the ``/calculate`` response body and its ETag, memoized.
+
+        Inputs are normalized to float/float/int first so ``500000`` and
+        ``500000.0`` share one entry (and one ETag).
+        """
+        key = (
+            float(property_value),
+            float(down_payment_percentage),
+            int(contract_years),
+        )
+        cached = calculate_cache.get(key)
+        if cached is not None:
+            return cached
+        body = {
+            "input": {
+                "property_value": key[0],
+                "down_payment_percentage": key[1],
+                "contract_years": key[2],
+            },
+            "calculated_values": SimulationService.calculate_simulation_values(*key),
         }
+        digest = hashlib.sha256(json.dumps(body, sort_keys=True).encode()).hexdigest()
+        entry = (body, f'"{digest[:32]}"')
+        calculate_cache.set(key, entry)
+        return entry
 
     @staticmethod
-    def create_simulation(db: Session, simulation_data: schemas.SimulationCreate, user_id: int):
-        calculated_values = SimulationService.calculate_simulation_values(
-            simulation_data.property_value,
-            simulation_data.down_payment_percentage,
-            simulation_data.contract_years,
+    def calculate_batch_values(
+        property_values, down_payment_percentages, contract_years
+    ) -> dict[str, list[float]]:
+        property_values = np.asarray(property_values, dtype=np.float64)
+        down_payment_percentages = np.asarray(
+            down_payment_percentages, dtype=np.float64
         )
-        return SimulationRepository.create(db, user_id, simulation_data, calculated_values)
+        contract_years = np.asarray(contract_years, dtype=np.int64)
+
+        invalid = (
+            ~(property_values > 0)
+            | ~((down_payment_percentages >= 0) & (down_payment_percentages <= 100))
+            | ~((contract_years >= 1) & (contract_years <= 30))
+        )
+        if invalid.any():
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": "Invalid scenarios in batch",
+                    "invalid_indices": np.flatnonzero(invalid)[:100].tolist(),
+                },
+            )
+
+        # Infinite rows are reported below, not warned about
+        with np.errstate(over="ignore", invalid="ignore"):
+            calculated = derive_values(
+                property_values, down_payment_percentages, contract_years
+            )
+        finite = np.logical_and.reduce([np.isfinite(v) for v in calculated.values()])
+        if not finite.all():
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": "Scenarios with results out of range",
+                    "invalid_indices": np.flatnonzero(~finite)[:100].tolist(),
+                },
+            )
+        return {name: values.tolist() for name, values in calculated.items()}
+
+    @staticmethod
+    def sweep_axes(sweep: schemas.SimulationSweep) -> list[np.ndarray]:
+        """Expand and validate the sweep ranges; the cell cap is checked first."""
+        ranges = [getattr(sweep, name) for name in SWEEP_AXES]
+        cells = 1
+        for r in ranges:
+            cells *= axis_length(r.start, r.stop, r.step, limit=schemas.MAX_SWEEP_CELLS)
+        if cells > schemas.MAX_SWEEP_CELLS:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Sweep exceeds the maximum of {schemas.MAX_SWEEP_CELLS} cells",
+            )
+
+        axes = [sweep_axis(r.start, r.stop, r.step) for r in ranges]
+        property_values, down_payment_percentages, contract_years = axes
+        invalid = {
+            "property_value": not (
+                np.isfinite(property_values) & (property_values > 0)
+            ).all(),
+            "down_payment_percentage": not (
+                (down_payment_percentages >= 0) & (down_payment_percentages <= 100)
+            ).all(),
+            "contract_years": not (
+                (contract_years == np.round(contract_years))
+                & (contract_years >= 1)
+                & (contract_years <= 30)
+            ).all(),
+        }
+        if any(invalid.values()):
+            raise HTTPException(
+                status_code=422,
+                detail={
+                    "message": "Sweep ranges fall outside the allowed values",
+                    "invalid_axes": [name for name, bad in invalid.items() if bad],
+                },
+            )
+        axes[2] = contract_years.astype(np.int64)
+
+        # Derived values are monotonic in every input, so if the corners of
+        # the grid are finite, every cell is
+        corners = np.meshgrid(*([axis[0], axis[-1]] for axis in axes), indexing="ij")
+        with np.errstate(over="ignore", invalid="ignore"):
+            extremes = derive_values(*corners)
+        if not all(np.isfinite(values).all() for values in extremes.values()):
+            raise HTTPException(
+                status_code=422,
+                detail="Sweep results fall outside the representable range",
+            )
+        return axes
 
     @staticmethod
-    def get_user_simulations(db: Session, user_id: int, skip: int = 0, limit: int = 100):
-        return SimulationRepository.list_by_user(db, user_id, skip, limit)
+    def sweep_grid(axes: list[np.ndarray]) -> dict:
+        """The whole grid in one vectorized pass, as columnar arrays."""
+        shape = [len(axis) for axis in axes]
+        _, calculated = next(grid_chunks(axes, int(np.prod(shape))))
+        return {
+            "count": int(np.prod(shape)),
+            "shape": shape,
+            "axes": {name: axis.tolist() for name, axis in zip(SWEEP_AXES, axes)},
+            "calculated_values": {
+                name: values.tolist() for name, values in calculated.items()
+            },
+        }
 
     @staticmethod
-    def get_simulation(db: Session, simulation_id: int, user_id: int):
-        return SimulationRepository.get_for_user(db, simulation_id, user_id)
+    def stream_sweep(
+        axes: list[np.ndarray], chunk_size: int = SWEEP_CHUNK_CELLS
+    ) -> Iterator[str]:
+        """NDJSON: a header line with the shape and axes, then one line per chunk."""
+        shape = [len(axis) for axis in axes]
+        yield json.dumps(
+            {
+                "count": int(np.prod(shape)),
+                "shape": shape,
+                "axes": {name: axis.tolist() for name, axis in zip(SWEEP_AXES, axes)},
+            }
+        ) + "\n"
+        for offset, calculated in grid_chunks(axes, chunk_size):
+            yield json.dumps(
+                {
+                    "offset": offset,
+                    "calculated_values": {
+                        name: values.tolist() for name, values in calculated.items()
+                    },
+                }
+            ) + "\n"
 
     @staticmethod
-    def update_simulation(
-        db: Session, simulation_id: int, simulation_data: schemas.SimulationUpdate, user_id: int
+    def derive_rows(simulations: list[schemas.SimulationCreate]) -> list[dict]:
+        """Column dicts for ``simulations`` with derived values computed in one pass."""
+        if DERIVED_VALUES_IN_DB:
+            return [simulation.model_dump() for simulation in simulations]
+        calculated = derive_values(
+            np.fromiter(
+                (s.property_value for s in simulations), np.float64, len(simulations)
+            ),
+            np.fromiter(
+                (s.down_payment_percentage for s in simulations),
+                np.float64,
+                len(simulations),
+            ),
+            np.fromiter(
+                (s.contract_years for s in simulations), np.int64, len(simulations)
+            ),
+        )
+        columns = {name: values.tolist() for name, values in calculated.items()}
+        return [
+            {**simulation.model_dump(), **{name: columns[name][i] for name in columns}}
+            for i, simulation in enumerate(simulations)
+        ]
+
+    @staticmethod
+    async def import_simulations(
+        db: AsyncSession, user_id: int, stream: BinaryIO, fmt: str
     ):
-        db_simulation = SimulationService.get_simulation(db, simulation_id, user_id)
-        update_data = simulation_data.dict(exclude_unset=True)
+        """Stream rows from an uploaded CSV/NDJSON file into the user's history.
 
-        if any(
-            key in update_data
-            for key in ["property_value", "down_payment_percentage", "contract_years"]
-        ):
-            property_value = update_data.get("property_value", db_simulation.property_value)
-            down_payment_percentage = update_data.get(
-                "down_payment_percentage", db_simulation.down_payment_percentage
+        Rows are parsed and validated off the event loop a chunk at a time and
+        each valid chunk is committed on its own, so a bad row (or a failed
+        chunk) is reported without discarding the rest of the file.
+        """
+        rows = iter_rows(stream, fmt)
+        imported = failed = 0
+        errors: list[dict] = []
+
+        def report(new_errors: list[dict]):
+            nonlocal failed
+            failed += len(new_errors)
+            errors.extend(new_errors[: MAX_REPORTED_ERRORS - len(errors)])
+
+        exhausted = False
+        while not exhausted:
+            valid, chunk_errors, exhausted = await asyncio.to_thread(
+                read_chunk, rows, IMPORT_CHUNK_SIZE
+            )
+            report(chunk_errors)
+            if not valid:
+                continue
+            records = SimulationService.derive_rows(
+                [simulation for _, simulation in valid]
             )
-            contract_years = update_data.get("contract_years", db_simulation.contract_years)
+            try:
+                imported += await SimulationRepository.bulk_create(db, user_id, records)
+            except SQLAlchemyError:
+                await db.rollback()
+                report(
+                    [
+                        {
+                            "line": line_number,
+                            "errors": ["Database rejected the row's chunk"],
+                        }
+                        for line_number, _ in valid
+                    ]
+                )
+
+        return {
+            "imported": imported,
+            "failed": failed,
+            "errors": errors,
+            "errors_truncated": failed > len(errors),
+        }
 
+    @staticmethod
+    async def export_simulations(
+        db: AsyncSession, user_id: int, fmt: str
+    ) -> AsyncIterator[str]:
+        """Serialized export of a user's history, one text chunk per cursor batch."""
+        if fmt == "csv":
+            yield csv_header()
+        serialize = csv_rows if fmt == "csv" else ndjson_rows
+        async for rows in SimulationRepository.stream_for_user(
+            db, user_id, EXPORT_COLUMNS, EXPORT_BATCH_SIZE
+        ):
+            yield serialize(rows)
+
+    @staticmethod
+    async def create_simulation(
+        db: AsyncSession, simulation_data: schemas.SimulationCreate, user_id: int
+    ):
+        calculated_values = None
+        if not DERIVED_VALUES_IN_DB:
             calculated_values = SimulationService.calculate_simulation_values(
-                property_value, down_payment_percentage, contract_years
+                simulation_data.property_value,
+                simulation_data.down_payment_percentage,
+                simulation_data.contract_years,
+            )
+        return await SimulationRepository.create(
+            db, user_id, simulation_data, calculated_values
+        )
+
+    @staticmethod
+    async def get_user_simulations(
+        db: AsyncSession,
+        user_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: str | None = None,
+        include_total: bool = True,
+        columns: list | None = None,
+    ):
+        return await SimulationRepository.list_by_user(
+            db, user_id, skip, limit, cursor, include_total, columns
+        )
+
+    @staticmethod
+    async def get_simulation(db: AsyncSession, simulation_id: int, user_id: int):
+        return await SimulationRepository.get_for_user(db, simulation_id, user_id)
+
+    @staticmethod
+    async def update_simulation(
+        db: AsyncSession,
+        simulation_id: int,
+        simulation_data: schemas.SimulationUpdate,
+        user_id: int,
+    ):
+        update_data = simulation_data.model_dump(exclude_unset=True)
+        return await SimulationRepository.update(
+            db, simulation_id, user_id, update_data
+        )
+
+    @staticmethod
+    async def delete_simulation(db: AsyncSession, simulation_id: int, user_id: int):
+        db_simulation = await SimulationService.get_simulation(
+            db, simulation_id, user_id
+        )
+        return await SimulationRepository.delete(db, db_simulation)
+
+    @staticmethod
+    async def batch_update(
+        db: AsyncSession, batch: schemas.SimulationBatchUpdate, user_id: int
+    ) -> dict:
+        """Apply many partial updates with one locking SELECT and few UPDATEs.
+
+        Only the fields each item sends are written, plus the derived values
+        of rows whose inputs changed (unless the database generates them),
+        computed in a single vectorized pass. The current inputs are read with
+        SELECT ... FOR UPDATE so neither they nor the statistics delta can go
+        stale before the write. Ids that do not exist or belong to another
+        user are reported as ``not_found``.
+        """
+        ids = [item.id for item in batch.updates]
+        current = {
+            row.id: row._asdict()
+            for row in await SimulationRepository.get_many_for_user(
+                db, user_id, ids, BATCH_UPDATE_COLUMNS, for_update=True
             )
-            update_data.update(calculated_values)
+        }
+        rows = [
+            {"id": item.id, **item.model_dump(exclude_unset=True, exclude={"id"})}
+            for item in batch.updates
+            if item.id in current
+        ]
+
+        stats_delta = (0, 0, 0)
+        if rows:
+            n = len(rows)
+            dtypes = (np.float64, np.float64, np.int64)
+            old_inputs = [
+                np.fromiter((current[row["id"]][name] for row in rows), dtype, n)
+                for name, dtype in zip(INPUT_FIELDS, dtypes)
+            ]
+            new_inputs = [
+                np.fromiter(
+                    (row.get(name, current[row["id"]][name]) for row in rows), dtype, n
+                )
+                for name, dtype in zip(INPUT_FIELDS, dtypes)
+            ]
+            changed = np.zeros(n, dtype=bool)
+            for new, old in zip(new_inputs, old_inputs):
+                changed |= new != old
+            if changed.any() and not DERIVED_VALUES_IN_DB:
+                calculated = {
+                    name: values.tolist()
+                    for name, values in derive_values(*new_inputs).items()
+                }
+                for i in np.flatnonzero(changed).tolist():
+                    for name, values in calculated.items():
+                        rows[i][name] = values[i]
+            stats_delta = tuple(
+                (new.sum() - old.sum()).item()
+                for new, old in zip(new_inputs, old_inputs)
+            )
+
+        await SimulationRepository.update_many(db, user_id, rows, stats_delta)
+        results = [
+            {"id": sim_id, "status": "updated" if sim_id in current else "not_found"}
+            for sim_id in ids
+        ]
+        return {
+            "processed": len(rows),
+            "not_found": len(ids) - len(rows),
+            "results": results,
+        }
+
+    @staticmethod
+    async def batch_delete(
+        db: AsyncSession, batch: schemas.SimulationBatchDelete, user_id: int
+    ) -> dict:
+        ids = list(dict.fromkeys(batch.ids))
+        deleted = set(await SimulationRepository.delete_many(db, user_id, ids))
+        results = [
+            {"id": sim_id, "status": "deleted" if sim_id in deleted else "not_found"}
+            for sim_id in ids
+        ]
+        return {
+            "processed": len(deleted),
+            "not_found": len(ids) - len(deleted),
+            "results": results,
+        }
+
+    @staticmethod
+    async def get_amortization_schedule(
+        db: AsyncSession,
+        simulation_id: int,
+        user_id: int,
+        system: str,
+        annual_interest_rate: float,
+        granularity: str = "month",
+    ):
+        sim = await SimulationService.get_simulation(db, simulation_id, user_id)
+        key = (
+            sim.id,
+            sim.updated_at or sim.created_at,
+            sim.financing_amount,
+            sim.contract_years,
+            system,
+            annual_interest_rate,
+            granularity,
+        )
+        cached = schedule_cache.get(key)
+        if cached is not None:
+            return cached
+
+        months = sim.contract_years * 12
+        schedule = {
+            name: values[0]
+            for name, values in amortization_schedule(
+                sim.financing_amount, annual_interest_rate, months, system
+            ).items()
+        }
+        if granularity == "year":
+            schedule = aggregate_by_year(schedule, months)
 
-        return SimulationRepository.update(db, db_simulation, update_data)
+        result = {
+            "simulation_id": sim.id,
+            "system": system,
+            "annual_interest_rate": annual_interest_rate,
+            "monthly_interest_rate": round(
+                float(monthly_rate(annual_interest_rate)) * 100, 6
+            ),
+            "granularity": granularity,
+            "financing_amount": sim.financing_amount,
+            "periods": len(schedule["payment"]),
+            "total_paid": round(float(schedule["payment"].sum()), 2),
+            "total_interest": round(float(schedule["interest"].sum()), 2),
+            **rounded(schedule),
+        }
+        schedule_cache.set(key, result)
+        return result
 
     @staticmethod
-    def delete_simulation(db: Session, simulation_id: int, user_id: int):
-        db_simulation = SimulationService.get_simulation(db, simulation_id, user_id)
-        return SimulationRepository.delete(db, db_simulation)
+    async def run_monte_carlo(
+        db: AsyncSession,
+        simulation_id: int,
+        user_id: int,
+        request: schemas.MonteCarloRequest,
+    ):
+        sim = await SimulationService.get_simulation(db, simulation_id, user_id)
+        params = {
+            "months": sim.contract_years * 12,
+            "financing_amount": sim.financing_amount,
+            "monthly_savings": sim.monthly_savings,
+            "total_to_save": sim.total_to_save,
+            "annual_interest_rate": request.annual_interest_rate,
+            "long_run_interest_rate": (
+                request.annual_interest_rate
+                if request.long_run_interest_rate is None
+                else request.long_run_interest_rate
+            ),
+            "interest_rate_volatility": request.interest_rate_volatility,
+            "mean_reversion": request.interest_rate_mean_reversion,
+            "monthly_income": request.monthly_income,
+            "income_growth": request.income_growth / 100,
+            "income_volatility": request.income_volatility / 100,
+            "correlation": request.income_rate_correlation,
+            "affordability_threshold": request.affordability_threshold,
+        }
+        seed = montecarlo.new_seed() if request.seed is None else request.seed
+        executor = (
+            montecarlo.get_executor()
+            if request.paths >= montecarlo.MONTECARLO_PARALLEL_MIN_PATHS
+            and montecarlo.MONTECARLO_WORKERS > 1
+            else None
+        )
+        # Off the event loop either way; with an executor this thread just waits on it
+        outputs = await asyncio.to_thread(
+            montecarlo.run_paths, params, request.paths, seed, executor
+        )
+        return {
+            "simulation_id": sim.id,
+            "paths": request.paths,
+            "seed": seed,
+            "years": list(range(1, sim.contract_years + 1)),
+            **montecarlo.summarize(params, outputs),
+        }
 
     @staticmethod
-    def get_simulation_statistics(db: Session, user_id: int):
-        simulations = db.query(models.Simulation).filter(models.Simulation.user_id == user_id).all()
-        if not simulations:
+    async def get_simulation_statistics(db: AsyncSession, user_id: int):
+        count, total_property_value, total_down_payment, total_contract_years = (
+            await SimulationRepository.get_stats_for_user(db, user_id)
+        )
+        if not count:
             return {
                 "total_simulations": 0,
                 "total_property_value": 0,
@@ -79,15 +553,9 @@ class SimulationService:
                 "average_contract_years": 0,
             }
 
-        total_property_value = sum(s.property_value for s in simulations)
-        avg_down_payment = sum(s.down_payment_percentage for s in simulations) / len(simulations)
-        avg_contract_years = sum(s.contract_years for s in simulations) / len(simulations)
-
         return {
-            "total_simulations": len(simulations),
+            "total_simulations": count,
             "total_property_value": round(total_property_value, 2),
-            "average_down_payment_percentage": round(avg_down_payment, 2),
-            "average_contract_years": round(avg_contract_years, 2),
+            "average_down_payment_percentage": round(total_down_payment / count, 2),
+            "average_contract_years": round(total_contract_years / count, 2),
         }
-
-
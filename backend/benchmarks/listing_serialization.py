@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Per-row cost of the simulation listing: response_model path vs fast path.
+
+Seeds an in-memory SQLite database, then times a page of each size from the
+query to the JSON bytes. The default path loads ORM objects, builds
+SimulationsListResponse and goes through the dump / validate / dump / json
+passes FastAPI applies to a response_model. The fast path selects row tuples
+and serializes them once with orjson.
+
+    python benchmarks/listing_serialization.py --rows 100 10000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine  # noqa: E402
+
+from app import models, schemas  # noqa: E402
+from app.crud.simulations import SimulationRepository  # noqa: E402
+from app.db import Base  # noqa: E402
+from app.services.serialization import LISTING_COLUMNS, listing_json  # noqa: E402
+from app.services.simulations import SimulationService  # noqa: E402
+
+
+async def seed(session, rows: int) -> int:
+    user = models.User(email="bench@example.com", hashed_password="x")
+    session.add(user)
+    await session.commit()
+    scenarios = [
+        schemas.SimulationCreate(
+            property_value=200000 + i,
+            down_payment_percentage=10 + i % 20,
+            contract_years=1 + i % 30,
+            property_address=f"Rua {i}, São Paulo",
+            notes="benchmark row",
+        )
+        for i in range(rows)
+    ]
+    await SimulationRepository.bulk_create(
+        session, user.id, SimulationService.derive_rows(scenarios)
+    )
+    return user.id
+
+
+async def response_model_page(session, user_id: int, rows: int) -> bytes:
+    sims, total, next_cursor = await SimulationRepository.list_by_user(
+        session, user_id, limit=rows
+    )
+    content = schemas.SimulationsListResponse(
+        simulations=sims, total=total, next_cursor=next_cursor
+    )
+    validated = schemas.SimulationsListResponse.model_validate(content.model_dump())
+    return json.dumps(
+        validated.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+async def fast_page(session, user_id: int, rows: int) -> bytes:
+    page, total, next_cursor = await SimulationRepository.list_by_user(
+        session, user_id, limit=rows, columns=LISTING_COLUMNS
+    )
+    return listing_json(page, total, next_cursor)
+
+
+async def measure(fn, session, user_id: int, rows: int, repeat: int) -> float:
+    await fn(session, user_id, rows)
+    best = float("inf")
+    for _ in range(repeat):
+        # Fresh identity map each time, as in a new request
+        session.expunge_all()
+        started = time.perf_counter()
+        await fn(session, user_id, rows)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main_async(sizes: list[int], repeat: int):
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        user_id = await seed(session, max(sizes))
+        print(f"{'rows':>6} {'path':<15} {'total ms':>9} {'us/row':>8} {'speedup':>8}")
+        for rows in sizes:
+            slow = await measure(response_model_page, session, user_id, rows, repeat)
+            fast = await measure(fast_page, session, user_id, rows, repeat)
+            for name, seconds in (("response_model", slow), ("fast", fast)):
+                print(
+                    f"{rows:>6} {name:<15} {seconds * 1000:>9.2f} "
+                    f"{seconds / rows * 1e6:>8.2f} {slow / seconds:>7.1f}x"
+                )
+    await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="best of N runs per size")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.rows, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
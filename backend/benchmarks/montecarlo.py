@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Paths-per-second benchmark for the Monte Carlo affordability engine.
+
+Runs app.services.montecarlo.run_paths inline (one core) and across a
+ProcessPoolExecutor for each worker count, and reports paths per second
+overall and per worker process.
+
+    python benchmarks/montecarlo.py --paths 50000 --years 30 --workers 1 2 4
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.montecarlo import run_paths  # noqa: E402
+
+
+def params_for(years: int) -> dict:
+    return {
+        "months": years * 12,
+        "financing_amount": 400000.0,
+        "monthly_savings": 208.33,
+        "total_to_save": 75000.0,
+        "annual_interest_rate": 10.0,
+        "long_run_interest_rate": 9.0,
+        "interest_rate_volatility": 1.5,
+        "mean_reversion": 0.3,
+        "monthly_income": 15000.0,
+        "income_growth": 0.03,
+        "income_volatility": 0.1,
+        "correlation": 0.0,
+        "affordability_threshold": 30.0,
+    }
+
+
+def measure(params: dict, paths: int, workers: int) -> float:
+    if workers == 0:
+        started = time.perf_counter()
+        run_paths(params, paths, seed=0)
+        return paths / (time.perf_counter() - started)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Warm the pool so process start-up is not billed to the run
+        run_paths(params, 100, seed=0, executor=executor)
+        started = time.perf_counter()
+        run_paths(params, paths, seed=0, executor=executor)
+        return paths / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--paths", type=int, default=20000)
+    parser.add_argument("--years", type=int, default=30)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1]
+    )
+    args = parser.parse_args()
+    params = params_for(args.years)
+
+    print(f"{'mode':<8} {'workers':>7} {'paths/s':>10} {'per core':>10}")
+    rate = measure(params, args.paths, 0)
+    print(f"{'inline':<8} {1:>7} {rate:>10.0f} {rate:>10.0f}")
+    for workers in args.workers:
+        rate = measure(params, args.paths, workers)
+        print(f"{'process':<8} {workers:>7} {rate:>10.0f} {rate / workers:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
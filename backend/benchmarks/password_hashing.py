@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Login throughput benchmark for the password hashing subsystem.
+
+Runs concurrent verify_and_update calls through app.core.hashing.PasswordHasher
+for each cost factor / worker count combination and reports logins per second
+overall and per worker thread (a worker maps to a core for bcrypt and argon2,
+which release the GIL while hashing).
+
+    python benchmarks/password_hashing.py --rounds 10 12 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.hashing import PasswordHasher, build_context  # noqa: E402
+
+
+async def measure(
+    scheme: str, rounds: int, workers: int, duration: float, concurrency: int
+):
+    hasher = PasswordHasher(
+        build_context([scheme], rounds), workers, max_pending=concurrency
+    )
+    stored = hasher.context.hash("benchmark-password")
+    done = 0
+    deadline = time.perf_counter() + duration
+
+    async def login_loop():
+        nonlocal done
+        while time.perf_counter() < deadline:
+            valid, _ = await hasher.verify_and_update("benchmark-password", stored)
+            assert valid
+            done += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    hasher.shutdown()
+    return done / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--scheme", default="bcrypt")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 12])
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1]
+    )
+    parser.add_argument(
+        "--duration", type=float, default=3.0, help="seconds per combination"
+    )
+    args = parser.parse_args()
+
+    print(
+        f"{'scheme':<8} {'cost':>4} {'workers':>7} {'logins/s':>10} {'per worker':>10}"
+    )
+    for rounds in args.rounds:
+        for workers in args.workers:
+            rate = asyncio.run(
+                measure(
+                    args.scheme, rounds, workers, args.duration, concurrency=workers * 2
+                )
+            )
+            print(
+                f"{args.scheme:<8} {rounds:>4} {workers:>7} "
+                f"{rate:>10.1f} {rate / workers:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
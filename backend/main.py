@@ -1,5 +1,11 @@
-from app.main import app
-from app.crud.users import UserRepository  # re-export for tests that patch main.UserRepository
+from dotenv import load_dotenv
+
+# Entry point only: the app package reads plain environment variables and never
+# loads .env itself, so importing it stays free of side effects.
+load_dotenv()
+
+from app.main import app  # noqa: E402
+from app.crud.users import UserRepository  # noqa: E402,F401  patched by tests via main
 
 if __name__ == "__main__":
     import uvicorn
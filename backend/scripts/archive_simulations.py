@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Move simulations older than a cutoff out of the hot simulations table.
+
+Goes partition by partition (see migration 005) in batches that commit on
+their own, moving rows to the compact simulations_archive table or, with
+--to-dir, into one gzipped NDJSON file per batch in that directory. Users'
+statistics rollups are decremented to match. Safe to stop and rerun at any time.
+
+    python scripts/archive_simulations.py --older-than-days 730
+    python scripts/archive_simulations.py --older-than-days 365 --to-dir archive-2024
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.db import engine  # noqa: E402
+from app.services.archival import ARCHIVE_BATCH_SIZE, archive_simulations  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--older-than-days", type=int, required=True)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument(
+        "--to-dir", help="write .ndjson.gz files here instead of to the archive table"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logging.getLogger("app.services.archival").setLevel(logging.INFO)
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    try:
+        archive_simulations(engine, cutoff, args.batch_size, args.to_dir)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
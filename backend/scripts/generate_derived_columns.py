@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Let PostgreSQL generate the derived simulation values (stored generated columns).
+
+Converts down_payment_amount, financing_amount, total_to_save and
+monthly_savings in one table rewrite; --revert turns them back into regular
+columns. Run it in the deploy that switches SIMULATION_DERIVED_IN_DB on (or,
+with --revert, off): writes from workers on the other setting fail until they
+restart. Running it twice is a no-op.
+
+    python scripts/generate_derived_columns.py
+    python scripts/generate_derived_columns.py --revert
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.db import engine  # noqa: E402
+from app.services.generated import (  # noqa: E402
+    generate_derived_columns,
+    store_derived_columns,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--revert",
+        action="store_true",
+        help="turn the generated columns back into regular ones",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logging.getLogger("app.services.generated").setLevel(logging.INFO)
+    try:
+        if args.revert:
+            store_derived_columns(engine)
+        else:
+            generate_derived_columns(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Rebuild the per-user statistics rollups (simulation_stats) from scratch.
+
+Writes made while SIMULATION_STATS_ROLLUP is off leave the rollups alone, so
+after switching the flag back on for every worker, run this once; until then
+/simulations/statistics may serve stale totals. The first time the flag is
+enabled it is not needed: rows are seeded per user on their next write.
+
+    python scripts/rebuild_simulation_stats.py
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.db import engine  # noqa: E402
+from app.services.rollup import rebuild_stats  # noqa: E402
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.split("\n\n")[1]).parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logging.getLogger("app.services.rollup").setLevel(logging.INFO)
+    try:
+        rebuild_stats(engine)
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
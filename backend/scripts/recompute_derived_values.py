@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Recompute the stored derived values of every simulation after a formula change.
+
+Walks the simulations table in id order in chunks, rewriting with one UPDATE
+per chunk only the rows whose stored values differ from the current formula.
+Progress is saved to a checkpoint file after every committed chunk, so an
+interrupted run resumes where it stopped when started again with the same
+--checkpoint. --rows-per-second throttles the job to spare the primary.
+
+    python scripts/recompute_derived_values.py
+    python scripts/recompute_derived_values.py --chunk-size 2000 --rows-per-second 5000
+    python scripts/recompute_derived_values.py --restart
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv  # noqa: E402
+
+load_dotenv()
+
+from app.db import engine  # noqa: E402
+from app.services.backfill import (  # noqa: E402
+    BACKFILL_CHUNK_SIZE,
+    BACKFILL_ROWS_PER_SECOND,
+    run_backfill,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument(
+        "--checkpoint", default="recompute_derived_values.checkpoint.json"
+    )
+    parser.add_argument("--chunk-size", type=int, default=BACKFILL_CHUNK_SIZE)
+    parser.add_argument(
+        "--rows-per-second",
+        type=float,
+        default=BACKFILL_ROWS_PER_SECOND,
+        help="average rate ceiling; 0 disables the throttle",
+    )
+    parser.add_argument(
+        "--max-chunks", type=int, help="stop after N chunks (resume later)"
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the checkpoint, start over"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s %(message)s")
+    logging.getLogger("app.services.backfill").setLevel(logging.INFO)
+
+    try:
+        state = run_backfill(
+            engine,
+            args.checkpoint,
+            chunk_size=args.chunk_size,
+            rows_per_second=args.rows_per_second,
+            max_chunks=args.max_chunks,
+            restart=args.restart,
+        )
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; run again with --checkpoint {args.checkpoint} to resume")
+        sys.exit(130)
+    finally:
+        engine.dispose()
+    if not state["completed"]:
+        print(f"Stopped at id {state['last_id']}; run again to continue")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import pytest
+
+from app import models  # noqa: F401
+from app.db import Base, engine
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database_schema():
+    """Tables for tests that go through the app's own engine.
+
+    The app leaves schema management to Alembic; against a migrated database
+    this is a no-op, against a throwaway SQLite file it creates the tables.
+    """
+    Base.metadata.create_all(bind=engine)
+    yield
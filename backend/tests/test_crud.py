@@ -1,63 +1,300 @@
+import asyncio
+
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
 from app.db import Base
 from app import models, schemas
+from app.core.cache import TTLCache
+from app.core.hashing import PasswordHasher, build_context, password_hasher
+from app.core.replicas import ReplicaSet, RoutingSession
+from app.core.security import (
+    authenticate_user,
+    create_access_token,
+    get_current_user,
+    user_cache,
+)
 from app.crud.users import UserRepository
 from fastapi import HTTPException
 
 
-@pytest.fixture()
-def db_session():
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    try:
+@pytest_asyncio.fixture()
+async def db_session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    TestingSessionLocal = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+    async with TestingSessionLocal() as session:
         yield session
-    finally:
-        session.close()
+    await engine.dispose()
 
 
-def test_create_and_get_user(db_session):
+@pytest.mark.asyncio
+async def test_create_and_get_user(db_session):
     user_in = schemas.UserCreate(email="unit@example.com", password="password123")
-    user = UserRepository.create_user(db_session, user_in)
+    user = await UserRepository.create_user(db_session, user_in)
 
     assert user.id is not None
     assert user.email == "unit@example.com"
     # hashed_password should not equal plain password
     assert user.hashed_password != user_in.password
 
-    fetched = UserRepository.get_user_by_email(db_session, "unit@example.com")
+    fetched = await UserRepository.get_user_by_email(db_session, "unit@example.com")
     assert fetched is not None
     assert fetched.id == user.id
 
 
-def test_unique_email_constraint(db_session):
+@pytest.mark.asyncio
+async def test_unique_email_constraint(db_session):
     user_in = schemas.UserCreate(email="dup@example.com", password="password123")
-    UserRepository.create_user(db_session, user_in)
+    await UserRepository.create_user(db_session, user_in)
     with pytest.raises(HTTPException) as exc:
-        UserRepository.create_user(db_session, user_in)
+        await UserRepository.create_user(db_session, user_in)
     assert exc.value.status_code == 400
 
 
-def test_update_user(db_session):
+@pytest.mark.asyncio
+async def test_update_user(db_session):
     user_in = schemas.UserCreate(email="update@example.com", password="password123")
-    user = UserRepository.create_user(db_session, user_in)
+    user = await UserRepository.create_user(db_session, user_in)
 
-    updated = UserRepository.update_user(db_session, user.id, schemas.UserUpdate(name="John"))
+    updated = await UserRepository.update_user(
+        db_session, user.id, schemas.UserUpdate(name="John")
+    )
     assert updated.name == "John"
 
 
-def test_delete_user(db_session):
+@pytest.mark.asyncio
+async def test_delete_user(db_session):
     user_in = schemas.UserCreate(email="delete@example.com", password="password123")
-    user = UserRepository.create_user(db_session, user_in)
+    user = await UserRepository.create_user(db_session, user_in)
 
-    result = UserRepository.delete_user(db_session, user.id)
+    result = await UserRepository.delete_user(db_session, user.id)
     assert result["message"].lower().startswith("user deleted")
 
     with pytest.raises(HTTPException):
-        UserRepository.delete_user(db_session, user.id)
+        await UserRepository.delete_user(db_session, user.id)
+
+
+@pytest.mark.asyncio
+async def test_current_user_cache_hits_and_invalidation(db_session):
+    user_cache.clear()
+    user = await UserRepository.create_user(
+        db_session,
+        schemas.UserCreate(email="cached@example.com", password="password123"),
+    )
+    token = create_access_token({"sub": user.email})
+
+    first = await get_current_user(token, db_session)
+    hits, misses = user_cache.hits, user_cache.misses
+    assert await get_current_user(token, db_session) is first
+    assert (user_cache.hits, user_cache.misses) == (hits + 1, misses)
+
+    await UserRepository.update_user(
+        db_session, user.id, schemas.UserUpdate(name="Cached")
+    )
+    refreshed = await get_current_user(token, db_session)
+    assert refreshed.name == "Cached"
+    assert user_cache.misses == misses + 1
+
+    await UserRepository.delete_user(db_session, user.id)
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(token, db_session)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_cached_user_survives_rollback_of_loading_session(db_session):
+    user_cache.clear()
+    user = await UserRepository.create_user(
+        db_session,
+        schemas.UserCreate(email="rollback@example.com", password="password123"),
+    )
+    token = create_access_token({"sub": user.email})
+
+    await get_current_user(token, db_session)
+    # e.g. a failed write later in the same request, then the request ends
+    await db_session.rollback()
+    await db_session.close()
+
+    cached = await get_current_user(token, db_session)
+    assert schemas.User.model_validate(cached).email == "rollback@example.com"
+
+
+def test_ttl_cache_expiry_and_lru_bound():
+    now = [0.0]
+    cache = TTLCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert cache.get("b") is None
+    now[0] = 11
+    assert cache.get("a") is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(db_session, monkeypatch):
+    monkeypatch.setattr(
+        password_hasher, "context", build_context(["bcrypt"], bcrypt_rounds=4)
+    )
+    user = await UserRepository.create_user(
+        db_session,
+        schemas.UserCreate(email="rehash@example.com", password="password123"),
+    )
+    old_hash = user.hashed_password
+
+    monkeypatch.setattr(
+        password_hasher, "context", build_context(["bcrypt"], bcrypt_rounds=5)
+    )
+    assert (
+        await authenticate_user(db_session, "rehash@example.com", "wrong-password")
+        is False
+    )
+    assert user.hashed_password == old_hash
+
+    assert (
+        await authenticate_user(db_session, "rehash@example.com", "password123") is user
+    )
+    assert user.hashed_password != old_hash
+    assert not password_hasher.context.needs_update(user.hashed_password)
+
+
+def test_build_context_rejects_unknown_schemes():
+    with pytest.raises(ValueError, match="PASSWORD_SCHEMES"):
+        build_context(["bcrypt", "bcryp"])
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(
+        build_context(["bcrypt"], bcrypt_rounds=4), workers=1, max_pending=0
+    )
+    with pytest.raises(HTTPException) as exc:
+        await hasher.hash("password123")
+    assert exc.value.status_code == 503
+    hasher.shutdown()
+
+
+@pytest_asyncio.fixture()
+async def routed_databases(tmp_path):
+    """A primary and two replica SQLite files, each holding one marker user.
+
+    Nothing replicates between them, so the markers a session sees tell which
+    database served its reads.
+    """
+    engines = []
+    for name in ("primary", "replica0", "replica1"):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(
+                models.User.__table__.insert(),
+                {"email": f"{name}@example.com", "hashed_password": "x"},
+            )
+        engines.append(engine)
+    yield engines
+    for engine in engines:
+        await engine.dispose()
+
+
+def routing_sessionmaker(primary, replicas):
+    return async_sessionmaker(
+        bind=primary,
+        sync_session_class=RoutingSession,
+        replicas=replicas,
+        autoflush=False,
+        expire_on_commit=False,
+    )
+
+
+async def marker(session) -> str:
+    emails = await session.scalars(select(models.User.email).where(models.User.id == 1))
+    return emails.one().split("@")[0]
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replicas_round_robin(routed_databases):
+    primary, *replica_engines = routed_databases
+    Session = routing_sessionmaker(primary, ReplicaSet(replica_engines, 30, 5))
+
+    seen = []
+    for _ in range(4):
+        async with Session() as session:
+            seen.append(await marker(session))
+            # A session keeps the replica it started reading from
+            assert await marker(session) == seen[-1]
+    assert seen == ["replica0", "replica1", "replica0", "replica1"]
+
+    async with Session(info={"use_primary": True}) as session:
+        assert await marker(session) == "primary"
+
+
+@pytest.mark.asyncio
+async def test_writes_and_read_your_writes_stay_on_primary(routed_databases):
+    user_cache.clear()
+    primary, *replica_engines = routed_databases
+    Session = routing_sessionmaker(primary, ReplicaSet(replica_engines, 30, 5))
+
+    async with Session() as session:
+        user = await UserRepository.create_user(
+            session, schemas.UserCreate(email="new@example.com", password="password123")
+        )
+        # Having written, the session reads its own changes from the primary
+        new_user = await UserRepository.get_user_by_email(session, "new@example.com")
+        assert new_user is not None
+        assert await marker(session) == "primary"
+
+    async with Session() as session:
+        missing = await UserRepository.get_user_by_email(session, "new@example.com")
+        assert missing is None
+        # Authentication retries a replica miss on the primary, then tags the session
+        token = create_access_token({"sub": "new@example.com"})
+        assert (await get_current_user(token, session)).id == user.id
+        assert session.info["user_id"] == user.id
+
+    # (The replicas never receive the new user, so the update must read the primary)
+    async with Session(info={"user_id": user.id, "use_primary": True}) as session:
+        await UserRepository.update_user(
+            session, user.id, schemas.UserUpdate(name="New")
+        )
+
+    # Within the sticky window that user's new sessions read from the primary
+    async with Session(info={"user_id": user.id}) as session:
+        assert await marker(session) == "primary"
+    async with Session(info={"user_id": user.id + 1}) as session:
+        assert await marker(session) != "primary"
+
+
+@pytest.mark.asyncio
+async def test_unreachable_replica_is_ejected_then_retried(routed_databases, tmp_path):
+    primary, healthy = routed_databases[:2]
+    broken = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    replicas = ReplicaSet([healthy, broken], eject_seconds=0.2, sticky_seconds=5)
+    Session = routing_sessionmaker(primary, replicas)
+
+    async with Session() as session:
+        assert await marker(session) == "replica0"
+    async with Session() as session:
+        with pytest.raises(OperationalError):
+            await marker(session)
+    assert [r["healthy"] for r in replicas.stats()] == [True, False]
+
+    for _ in range(3):
+        async with Session() as session:
+            assert await marker(session) == "replica0"
 
+    # With every replica ejected, reads fall back to the primary
+    replicas.eject(0)
+    async with Session() as session:
+        assert await marker(session) == "primary"
 
+    await asyncio.sleep(0.25)
+    assert [r["healthy"] for r in replicas.stats()] == [True, True]
+    await broken.dispose()
@@ -1,5 +1,12 @@
+import asyncio
+import shutil
+import uuid
+
 from fastapi.testclient import TestClient
 from main import app
+from app import db as app_db
+from app.core.instrumentation import assert_max_queries
+from app.services import calculations
 import pytest
 from unittest.mock import patch, MagicMock
 
@@ -20,6 +27,108 @@ def test_health_check():
     assert response.json() == {"status": "healthy", "service": "aMORA API"}
 
 
+def test_readiness_reports_pool_stats():
+    """Test readiness endpoint checks the database and exposes pool stats"""
+    response = client.get("/ready")
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["pool"]["wait_seconds"]["count"] >= 1
+    assert data["pool"]["connect_seconds"]["count"] >= 1
+
+
+def test_metrics_exposes_route_latency_and_db_usage():
+    """Test /metrics reports per-route histograms, statuses and query counts"""
+    client.get("/ready")
+    client.get("/does-not-exist")
+    client.get("/simulations/42")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+
+    body = response.text
+    assert "# TYPE http_responses_total counter" in body
+    assert 'http_responses_total{method="GET",route="/ready",status="200"}' in body
+    assert 'http_responses_total{method="GET",route="unmatched",status="404"}' in body
+    assert 'route="/simulations/{simulation_id}",status="401"' in body
+    assert (
+        'http_request_duration_seconds_bucket{method="GET",route="/ready",le="+Inf"}'
+        in body
+    )
+    assert (
+        'http_request_db_queries_bucket{method="GET",route="/ready",le="0"} 0' in body
+    )
+    assert "http_requests_in_flight 1" in body
+    assert 'cache_hits_total{cache="calculate"}' in body
+
+
+@assert_max_queries(0)
+def test_calculate_issues_no_queries():
+    """Test the public calculator never touches the database"""
+    response = client.post(
+        "/calculate",
+        json={
+            "property_value": 420000,
+            "down_payment_percentage": 15,
+            "contract_years": 25,
+        },
+    )
+    assert response.status_code == 200
+
+
+def test_query_budget_helper_reports_statements():
+    """Test assert_max_queries fails listing the statements that ran"""
+    with pytest.raises(AssertionError) as exc:
+        with assert_max_queries(0):
+            client.get("/ready")
+    assert "Expected at most 0 queries, 1 ran" in str(exc.value)
+    assert "SELECT 1" in str(exc.value)
+
+
+def test_slow_and_repeated_queries_are_logged(caplog, monkeypatch):
+    """Test the slow-query log and N+1 warning name the route"""
+    from app.core import instrumentation
+
+    monkeypatch.setattr(instrumentation, "DB_SLOW_QUERY_MS", 0)
+    monkeypatch.setattr(instrumentation, "DB_REPEATED_QUERY_THRESHOLD", 1)
+    with caplog.at_level("WARNING", logger="app.core.instrumentation"):
+        client.get("/ready")
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any(m.startswith("Slow query") and "GET /ready" in m for m in messages)
+    assert any(m.startswith("Possible N+1 on GET /ready") for m in messages)
+
+
+def test_lifespan_warm_up_primes_caches_and_reports_cold_start(monkeypatch):
+    """Test the opt-in warm-up runs at startup and cold-start timings are exported"""
+    import app.main as app_main
+    from app.services.simulations import calculate_cache
+
+    monkeypatch.setattr(app_main, "STARTUP_WARMUP", True)
+    monkeypatch.setattr(app_main, "STARTUP_WARMUP_CONNECTIONS", 2)
+    # Shutdown would stop the hashing pool the module-level client still needs
+    monkeypatch.setattr(app_main.password_hasher, "shutdown", lambda: None)
+    calculate_cache.clear()
+
+    with TestClient(app) as warm_client:
+        assert len(calculate_cache) > 0
+        hits = calculate_cache.hits
+        response = warm_client.post(
+            "/calculate",
+            json={
+                "property_value": 500000,
+                "down_payment_percentage": 20,
+                "contract_years": 30,
+            },
+        )
+        assert response.status_code == 200
+        assert calculate_cache.hits == hits + 1
+        metrics = warm_client.get("/metrics").text
+        assert 'app_cold_start_seconds{phase="ready"}' in metrics
+
+
 def test_calculate_simulation():
     """Test calculation endpoint without authentication"""
     response = client.post(
@@ -44,6 +153,250 @@ def test_calculate_simulation():
     assert calculated["monthly_savings"] == 208.33  # 75000 / (30 * 12)
 
 
+def test_calculate_accepts_values_too_large_to_scale_to_cents():
+    """Test huge property values come back unrounded instead of overflowing"""
+    huge = {"property_value": 1e308, "down_payment_percentage": 15, "contract_years": 1}
+    for response in (
+        client.post("/calculate", json=huge),
+        client.get("/calculate", params=huge),
+    ):
+        assert response.status_code == 200
+        assert response.json()["calculated_values"]["total_to_save"] == 1.5e307
+
+
+def test_calculate_is_memoized_with_etag():
+    """Test /calculate caches normalized inputs; the GET form honours If-None-Match"""
+    from app.services.simulations import calculate_cache
+
+    calculate_cache.clear()
+    before = calculate_cache.stats()
+    payload = {
+        "property_value": 350000,
+        "down_payment_percentage": 10,
+        "contract_years": 20,
+    }
+
+    posted = client.post("/calculate", json=payload)
+    assert posted.status_code == 200
+    assert "etag" not in posted.headers
+    assert "cache-control" not in posted.headers
+
+    first = client.get("/calculate", params={**payload, "property_value": 350000.0})
+    assert first.status_code == 200
+    assert first.json() == posted.json()
+    assert "max-age=" in first.headers["cache-control"]
+
+    stats = client.get("/calculate/cache").json()
+    assert stats["misses"] - before["misses"] == 1
+    assert stats["hits"] - before["hits"] == 1
+
+    revalidated = client.get(
+        "/calculate", params=payload, headers={"If-None-Match": first.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    invalid = {**payload, "contract_years": 31}
+    assert client.get("/calculate", params=invalid).status_code == 422
+
+
+def test_calculate_batch_columnar():
+    """Test batch calculation with columnar arrays"""
+    response = client.post(
+        "/calculate/batch",
+        json={
+            "property_value": [500000, 250000],
+            "down_payment_percentage": [20, 10],
+            "contract_years": [30, 10],
+        },
+    )
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["count"] == 2
+    calculated = data["calculated_values"]
+    assert calculated["down_payment_amount"] == [100000.0, 25000.0]
+    assert calculated["financing_amount"] == [400000.0, 225000.0]
+    assert calculated["total_to_save"] == [75000.0, 37500.0]
+    assert calculated["monthly_savings"] == [208.33, 312.5]
+
+
+def test_calculate_batch_rows_and_invalid_inputs():
+    """Test batch calculation with rows and with invalid scenarios"""
+    response = client.post(
+        "/calculate/batch",
+        json={
+            "scenarios": [
+                {
+                    "property_value": 500000,
+                    "down_payment_percentage": 20,
+                    "contract_years": 30,
+                }
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["calculated_values"]["monthly_savings"] == [208.33]
+
+    # Mismatched column lengths
+    response = client.post(
+        "/calculate/batch",
+        json={
+            "property_value": [1, 2],
+            "down_payment_percentage": [1],
+            "contract_years": [1],
+        },
+    )
+    assert response.status_code == 422
+
+    # Out-of-range values are reported by index
+    response = client.post(
+        "/calculate/batch",
+        json={
+            "property_value": [500000, -1, 500000],
+            "down_payment_percentage": [20, 20, 150],
+            "contract_years": [30, 30, 30],
+        },
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"]["invalid_indices"] == [1, 2]
+
+    # Non-finite and overflowing items are rejected before NumPy sees them
+    for body in (
+        '{"property_value": [Infinity], "down_payment_percentage": [20], '
+        '"contract_years": [30]}',
+        '{"property_value": [500000], "down_payment_percentage": [NaN], '
+        '"contract_years": [30]}',
+        '{"property_value": [500000], "down_payment_percentage": [20], '
+        '"contract_years": [1e23]}',
+    ):
+        response = client.post(
+            "/calculate/batch",
+            content=body,
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 422
+
+    # Rows are full SimulationCreate models, where Infinity passes gt=0
+    response = client.post(
+        "/calculate/batch",
+        content=(
+            '{"scenarios": [{"property_value": 500000, "down_payment_percentage": 20, '
+            '"contract_years": 30}, {"property_value": Infinity, '
+            '"down_payment_percentage": 20, "contract_years": 30}]}'
+        ),
+        headers={"Content-Type": "application/json"},
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"]["invalid_indices"] == [1]
+
+    response = client.post(
+        "/calculate/batch",
+        json={
+            "property_value": [1e308],
+            "down_payment_percentage": [20],
+            "contract_years": [30],
+        },
+    )
+    assert response.status_code == 200
+    assert response.json()["calculated_values"]["total_to_save"] == [1.5e307]
+
+
+def test_calculate_sweep_grid():
+    """Test sweep returns the cartesian grid matching /calculate per cell"""
+    response = client.post(
+        "/calculate/sweep",
+        json={
+            "property_value": {"start": 300000, "stop": 500000, "step": 100000},
+            "down_payment_percentage": {"start": 10, "stop": 30, "step": 10},
+            "contract_years": {"start": 10, "stop": 30, "step": 10},
+        },
+    )
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["count"] == 27
+    assert data["shape"] == [3, 3, 3]
+    assert data["axes"]["contract_years"] == [10, 20, 30]
+    # C order: the last cell is the last value of every axis
+    single = client.post(
+        "/calculate",
+        json={
+            "property_value": 500000,
+            "down_payment_percentage": 30,
+            "contract_years": 30,
+        },
+    ).json()["calculated_values"]
+    last = {name: values[-1] for name, values in data["calculated_values"].items()}
+    assert last == single
+
+
+def test_calculate_sweep_limits():
+    """Test sweep rejects oversized grids and out-of-range axes"""
+    too_big = client.post(
+        "/calculate/sweep",
+        json={
+            "property_value": {"start": 1, "stop": 10_000_000, "step": 1},
+            "down_payment_percentage": {"start": 20},
+            "contract_years": {"start": 30},
+        },
+    )
+    assert too_big.status_code == 422
+
+    for property_value in (
+        {"start": 1, "stop": 1e308, "step": 1e-300},
+        {"start": -1e308, "stop": 1e308},
+    ):
+        overflowing = client.post(
+            "/calculate/sweep",
+            json={
+                "property_value": property_value,
+                "down_payment_percentage": {"start": 20},
+                "contract_years": {"start": 30},
+            },
+        )
+        assert overflowing.status_code == 422
+
+    for literal in ("Infinity", "NaN"):
+        non_finite = client.post(
+            "/calculate/sweep",
+            content=(
+                '{"property_value": {"start": 1, "stop": %s}, '
+                '"down_payment_percentage": {"start": 20}, '
+                '"contract_years": {"start": 30}}' % literal
+            ),
+            headers={"Content-Type": "application/json"},
+        )
+        assert non_finite.status_code == 422
+
+    out_of_range = client.post(
+        "/calculate/sweep",
+        json={
+            "property_value": {"start": 500000},
+            "down_payment_percentage": {"start": 50, "stop": 150, "step": 50},
+            "contract_years": {"start": 30},
+        },
+    )
+    assert out_of_range.status_code == 422
+    assert out_of_range.json()["detail"]["invalid_axes"] == ["down_payment_percentage"]
+
+
+def test_calculate_sweep_rejects_results_that_overflow(monkeypatch):
+    """Test sweep answers with finite results or 422, never null cells"""
+    sweep = {
+        "property_value": {"start": 1.7e308, "stop": 1.79e308, "step": 1e306},
+        "down_payment_percentage": {"start": 20},
+        "contract_years": {"start": 30},
+    }
+    response = client.post("/calculate/sweep", json=sweep)
+    assert response.status_code == 200
+    assert None not in response.json()["calculated_values"]["total_to_save"]
+
+    # A formula whose results overflow for the largest inputs
+    monkeypatch.setattr(calculations, "SAVINGS_RATE", 10.0)
+    response = client.post("/calculate/sweep", json=sweep)
+    assert response.status_code == 422
+
+
 def test_calculate_invalid_inputs():
     """Test calculation endpoint with invalid inputs"""
     # Invalid property value
@@ -167,5 +520,73 @@ def test_protected_endpoints_require_auth():
     assert response.status_code == 401
 
 
+@pytest.mark.skipif(
+    not app_db.engine.url.drivername.startswith("sqlite")
+    or not app_db.engine.url.database,
+    reason="snapshots the primary's SQLite file as a lagging replica",
+)
+def test_writes_read_from_primary_when_replica_lags(tmp_path, monkeypatch):
+    """Test mutating routes never act on rows read from a stale replica"""
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from app import models
+    from app.crud import simulations as simulation_crud
+
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", True)
+    monkeypatch.setattr(app_db.replicas, "sticky_seconds", 0)
+    email = f"replica-{uuid.uuid4().hex}@example.com"
+    client.post("/register", json={"email": email, "password": "password123"})
+    token = client.post("/token", data={"username": email, "password": "password123"})
+    headers = {"Authorization": f"Bearer {token.json()['access_token']}"}
+    created = client.post(
+        "/simulations/",
+        json={
+            "property_value": 100000,
+            "down_payment_percentage": 10,
+            "contract_years": 20,
+            "notes": "a",
+        },
+        headers=headers,
+    ).json()
+
+    # The replica stops here; the primary moves on
+    replica_path = tmp_path / "replica.db"
+    shutil.copy(app_db.engine.url.database, replica_path)
+    replica = create_async_engine(f"sqlite+aiosqlite:///{replica_path}")
+    monkeypatch.setattr(app_db.replicas, "engines", [replica])
+    updated = client.put(
+        f"/simulations/{created['id']}",
+        json={"property_value": 500000, "notes": "b"},
+        headers=headers,
+    )
+    assert updated.status_code == 200
+    stale = client.get(f"/simulations/{created['id']}", headers=headers).json()
+    assert stale["property_value"] == 100000
+
+    batch = client.patch(
+        "/simulations/batch",
+        json={"updates": [{"id": created["id"], "property_type": "house"}]},
+        headers=headers,
+    )
+    assert batch.json()["processed"] == 1
+    with app_db.engine.connect() as conn:
+        row = conn.execute(
+            select(models.Simulation).where(models.Simulation.id == created["id"])
+        ).one()
+    assert (row.property_value, row.notes, row.property_type) == (500000, "b", "house")
+
+    # The statistics delta comes from the row as the primary has it
+    deleted = client.delete(f"/simulations/{created['id']}", headers=headers)
+    assert deleted.status_code == 200
+    with app_db.engine.connect() as conn:
+        stats = conn.execute(
+            select(models.SimulationStats).where(
+                models.SimulationStats.user_id == row.user_id
+            )
+        ).one()
+    assert (stats.simulation_count, stats.total_property_value) == (0, 0)
+    asyncio.run(replica.dispose())
+
+
 if __name__ == "__main__":
     pytest.main([__file__])
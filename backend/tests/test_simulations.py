@@ -1,30 +1,70 @@
+import gzip
+import io
+import json
+import re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
 import pytest
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import pytest_asyncio
+from sqlalchemy import (
+    Column,
+    Computed,
+    Float,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+    func,
+    insert,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from app.core.instrumentation import assert_max_queries
 from app.db import Base
 from app import models, schemas
-from app.services.simulations import SimulationService
+from app.crud import simulations as simulation_crud
+from app.crud.derived import DERIVED_FIELDS, DERIVED_VALUES_IN_DB, generated_expressions
+from app.services import montecarlo
+from app.services import simulations as simulation_services
+from app.services.amortization import amortization_schedule
+from app.services.archival import ARCHIVE_COLUMNS, archive_simulations
+from app.services.backfill import run_backfill
+from app.services.generated import GENERATED_SQL
+from app.services.rollup import rebuild_stats
+from app.services.calculations import derive_values, round2
+from app.services.serialization import (
+    LISTING_COLUMNS,
+    listing_columns,
+    listing_json,
+    resolve_listing_fields,
+)
+from app.services.simulations import SimulationService, schedule_cache
 from fastapi import HTTPException
 
 
-@pytest.fixture()
-def db_session():
-    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
-    TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
-    try:
+@pytest_asyncio.fixture()
+async def db_session():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    TestingSessionLocal = async_sessionmaker(
+        bind=engine, autoflush=False, expire_on_commit=False
+    )
+    async with TestingSessionLocal() as session:
         yield session
-    finally:
-        session.close()
+    await engine.dispose()
 
 
-def create_user(db):
+async def create_user(db):
     user = models.User(email="simuser@example.com", name=None, hashed_password="hash")
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
@@ -36,8 +76,23 @@ def test_calculate_values():
     assert result["monthly_savings"] == 208.33
 
 
-def test_create_and_get_simulation(db_session):
-    user = create_user(db_session)
+def test_batch_values_match_scalar():
+    property_values = [500000, 123456.78, 99999.99, 1_000_000.5]
+    down_payments = [20, 12.5, 0, 100]
+    years = [30, 7, 1, 25]
+
+    batch = SimulationService.calculate_batch_values(
+        property_values, down_payments, years
+    )
+    for i, args in enumerate(zip(property_values, down_payments, years)):
+        scalar = SimulationService.calculate_simulation_values(*args)
+        for name, value in scalar.items():
+            assert batch[name][i] == value
+
+
+@pytest.mark.asyncio
+async def test_create_and_get_simulation(db_session):
+    user = await create_user(db_session)
     sim_in = schemas.SimulationCreate(
         property_value=500000,
         down_payment_percentage=20,
@@ -47,51 +102,870 @@ def test_create_and_get_simulation(db_session):
         notes="Teste",
     )
 
-    sim = SimulationService.create_simulation(db_session, sim_in, user.id)
+    sim = await SimulationService.create_simulation(db_session, sim_in, user.id)
     assert sim.id is not None
     assert sim.user_id == user.id
     # Check calculated fields persisted
     assert sim.down_payment_amount == 100000.0
 
-    fetched = SimulationService.get_simulation(db_session, sim.id, user.id)
+    fetched = await SimulationService.get_simulation(db_session, sim.id, user.id)
     assert fetched.id == sim.id
 
 
-def test_get_user_simulations_and_stats(db_session):
-    user = create_user(db_session)
+@pytest.mark.asyncio
+async def test_get_user_simulations_and_stats(db_session):
+    user = await create_user(db_session)
     for i in range(3):
-        SimulationService.create_simulation(
+        await SimulationService.create_simulation(
             db_session,
             schemas.SimulationCreate(property_value=100000 * (i + 1), down_payment_percentage=10, contract_years=10),
             user.id,
         )
 
-    sims, total = SimulationService.get_user_simulations(db_session, user.id)
+    sims, total, next_cursor = await SimulationService.get_user_simulations(
+        db_session, user.id
+    )
     assert total == 3
     assert len(sims) == 3
+    assert next_cursor is None
 
-    stats = SimulationService.get_simulation_statistics(db_session, user.id)
+    stats = await SimulationService.get_simulation_statistics(db_session, user.id)
     assert stats["total_simulations"] == 3
 
 
-def test_update_and_delete_simulation(db_session):
-    user = create_user(db_session)
-    sim = SimulationService.create_simulation(
+@pytest.mark.asyncio
+async def test_cursor_pagination_walks_every_simulation_once(db_session):
+    user = await create_user(db_session)
+    created = []
+    for i in range(5):
+        sim = await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=100000 + i, down_payment_percentage=10, contract_years=10
+            ),
+            user.id,
+        )
+        created.append(sim.id)
+    # Three rows share a timestamp, so pages must break the tie on id
+    shared = datetime(2024, 5, 1, 12, 0, 0, 250000, tzinfo=timezone.utc)
+    await db_session.execute(
+        update(models.Simulation)
+        .where(models.Simulation.id.in_(created[1:4]))
+        .values(created_at=shared)
+    )
+    await db_session.commit()
+
+    seen, cursor = [], None
+    while True:
+        with assert_max_queries(1):
+            page, total, cursor = await SimulationService.get_user_simulations(
+                db_session, user.id, limit=2, cursor=cursor, include_total=False
+            )
+        assert total is None
+        seen.extend(sim.id for sim in page)
+        if cursor is None:
+            break
+
+    assert seen == [created[4], created[0], created[3], created[2], created[1]]
+
+    with pytest.raises(HTTPException) as exc:
+        await SimulationService.get_user_simulations(
+            db_session, user.id, cursor="not-a-cursor"
+        )
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_fast_listing_json_matches_response_model(db_session):
+    user = await create_user(db_session)
+    for i, notes in enumerate(
+        [None, "Apartamento à venda, 3 quartos", 'quote " and \\ slash']
+    ):
+        await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=250000.5 + i,
+                down_payment_percentage=12.5,
+                contract_years=7,
+                notes=notes,
+            ),
+            user.id,
+        )
+
+    sims, total, next_cursor = await SimulationService.get_user_simulations(
+        db_session, user.id, limit=2
+    )
+    expected = schemas.SimulationsListResponse(
+        simulations=sims, total=total, next_cursor=next_cursor
+    ).model_dump_json()
+
+    rows, fast_total, fast_cursor = await SimulationService.get_user_simulations(
+        db_session, user.id, limit=2, columns=LISTING_COLUMNS
+    )
+    assert (fast_total, fast_cursor) == (total, next_cursor)
+    assert listing_json(rows, fast_total, fast_cursor).decode() == expected
+
+
+@pytest.mark.asyncio
+async def test_projected_listing_selects_only_requested_columns(db_session):
+    user = await create_user(db_session)
+    for i in range(3):
+        await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=300000 + i,
+                down_payment_percentage=20,
+                contract_years=10,
+                notes="x" * 500,
+            ),
+            user.id,
+        )
+
+    summary = resolve_listing_fields(None, "summary")
+    assert "notes" not in summary and "property_address" not in summary
+    assert resolve_listing_fields(None, "full") is None
+
+    fields = resolve_listing_fields("monthly_savings, property_value", "full")
+    assert fields == ["property_value", "id", "monthly_savings"]
+    columns = listing_columns(fields)
+    assert [c.key for c in columns] == [
+        "property_value",
+        "id",
+        "monthly_savings",
+        "created_at",
+    ]
+
+    with assert_max_queries(1) as budget:
+        rows, total, cursor = await SimulationService.get_user_simulations(
+            db_session, user.id, limit=2, include_total=False, columns=columns
+        )
+        statements = budget.statements
+    assert "notes" not in statements[0]
+    page = json.loads(listing_json(rows, total, cursor, fields, columns))
+    assert [set(sim) for sim in page["simulations"]] == [set(fields)] * 2
+    assert page["next_cursor"] is not None
+
+    with pytest.raises(HTTPException) as exc:
+        resolve_listing_fields("id,password", "full")
+    assert exc.value.status_code == 422
+    assert exc.value.detail["unknown"] == ["password"]
+
+
+@pytest.mark.asyncio
+async def test_update_and_delete_simulation(db_session):
+    user = await create_user(db_session)
+    sim = await SimulationService.create_simulation(
         db_session,
         schemas.SimulationCreate(property_value=200000, down_payment_percentage=10, contract_years=20),
         user.id,
     )
 
-    updated = SimulationService.update_simulation(
+    updated = await SimulationService.update_simulation(
         db_session, sim.id, schemas.SimulationUpdate(property_value=300000), user.id
     )
     assert updated.property_value == 300000
     assert updated.down_payment_amount == 30000.0
 
-    result = SimulationService.delete_simulation(db_session, sim.id, user.id)
+    result = await SimulationService.delete_simulation(db_session, sim.id, user.id)
     assert result["message"].lower().startswith("simulation deleted")
 
     with pytest.raises(HTTPException):
-        SimulationService.get_simulation(db_session, sim.id, user.id)
+        await SimulationService.get_simulation(db_session, sim.id, user.id)
+
+
+@pytest.mark.asyncio
+async def test_create_and_update_are_single_statements(db_session, monkeypatch):
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", False)
+    user = await create_user(db_session)
+    with assert_max_queries(1):
+        sim = await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=200000, down_payment_percentage=10, contract_years=20
+            ),
+            user.id,
+        )
+    assert sim.id is not None and sim.created_at is not None
+
+    # Derived values come from SQL using the stored contract_years; they must
+    # match the Python calculation to the bit, ties included
+    with assert_max_queries(1):
+        updated = await SimulationService.update_simulation(
+            db_session,
+            sim.id,
+            schemas.SimulationUpdate(
+                property_value=123456.785, down_payment_percentage=12.5
+            ),
+            user.id,
+        )
+    expected = SimulationService.calculate_simulation_values(123456.785, 12.5, 20)
+    assert {name: getattr(updated, name) for name in expected} == expected
+    assert updated.updated_at is not None
+
+    with pytest.raises(HTTPException) as exc:
+        await SimulationService.update_simulation(
+            db_session, sim.id, schemas.SimulationUpdate(notes="not mine"), user.id + 1
+        )
+    assert exc.value.status_code == 404
+    # The 404 leaves the session alone: nothing loaded in it was expired
+    assert updated.property_value == 123456.785 and user.email
+
+
+@pytest.mark.asyncio
+async def test_create_and_update_with_rollup_stay_bounded(db_session, monkeypatch):
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", True)
+    user = await create_user(db_session)
+    payload = schemas.SimulationCreate(
+        property_value=200000, down_payment_percentage=10, contract_years=20
+    )
+    # The user's first write seeds the rollup row from the table, in a savepoint
+    with assert_max_queries(6):
+        await SimulationService.create_simulation(db_session, payload, user.id)
+    # After that each write adds its delta with one more statement; an update
+    # also reads (and locks) the previous inputs first
+    with assert_max_queries(2):
+        sim = await SimulationService.create_simulation(db_session, payload, user.id)
+    with assert_max_queries(3):
+        await SimulationService.update_simulation(
+            db_session, sim.id, schemas.SimulationUpdate(contract_years=30), user.id
+        )
+
+    stats = await SimulationService.get_simulation_statistics(db_session, user.id)
+    assert stats["total_simulations"] == 2
+    assert stats["average_contract_years"] == 25
+
+
+def test_round2_is_half_to_even_on_scaled_cents():
+    # Documented difference from round(), which sees 2.675 as 2.67499999...
+    assert round2(2.675) == 2.68 and round(2.675, 2) == 2.67
+    assert round2([0.125, 0.135]).tolist() == [0.12, 0.14]
+    assert round2(1e308) == 1e308
+    assert np.isnan(round2(np.nan)) and round2(-np.inf) == -np.inf
+
+
+@pytest.mark.asyncio
+async def test_generated_columns_match_python_derived_values():
+    # Same expressions the generated columns use when SIMULATION_DERIVED_IN_DB is on
+    expressions = generated_expressions()
+    table = Table(
+        "derived",
+        MetaData(),
+        Column("id", Integer, primary_key=True),
+        Column("property_value", Float, nullable=False),
+        Column("down_payment_percentage", Float, nullable=False),
+        Column("contract_years", Integer, nullable=False),
+        *(
+            Column(name, Float, Computed(expressions[name], persisted=True))
+            for name in DERIVED_FIELDS
+        ),
+    )
+    rng = np.random.default_rng(7)
+    n = 2000
+    inputs = {
+        # Quarter-cent property values and half-point percentages produce exact ties
+        "property_value": np.round(rng.uniform(1_000, 5_000_000, n) * 4) / 4,
+        "down_payment_percentage": rng.integers(0, 201, n) / 2,
+        "contract_years": rng.integers(1, 31, n),
+    }
+    # Values with no cents left to round, up to where scaling would overflow
+    inputs["property_value"][:3] = [1e308, 2.0**60 + 2**8, 4.5e15]
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(table.metadata.create_all)
+        await conn.execute(
+            table.insert(),
+            [
+                {name: values[i].item() for name, values in inputs.items()}
+                for i in range(n)
+            ],
+        )
+        query = select(*(table.c[name] for name in DERIVED_FIELDS)).order_by(table.c.id)
+        rows = (await conn.execute(query)).all()
+    await engine.dispose()
+
+    expected = derive_values(*inputs.values())
+    for i, name in enumerate(DERIVED_FIELDS):
+        assert np.array_equal(np.array([row[i] for row in rows]), expected[name])
+
+
+def test_frozen_generated_sql_matches_the_expressions():
+    # The conversion command ships literal DDL; it must stay what the app computes
+    dialect = postgresql.dialect()
+    compiled = {
+        name: str(expr.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+        for name, expr in generated_expressions().items()
+    }
+    assert GENERATED_SQL == compiled
+
+
+@pytest.mark.skipif(
+    DERIVED_VALUES_IN_DB, reason="the database generates derived values"
+)
+def test_backfill_recomputes_stale_rows_in_resumable_chunks(tmp_path):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    inputs = [(100000 + i * 1000, i % 50, 1 + i % 30) for i in range(10)]
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.User).values(
+                email="backfill@example.com", hashed_password="x"
+            )
+        )
+        rows = []
+        for i, (pv, dp, years) in enumerate(inputs):
+            values = SimulationService.calculate_simulation_values(pv, dp, years)
+            if i % 3 == 0:
+                # As if written under an older savings rule
+                values["total_to_save"] = values["monthly_savings"] = 1.0
+            rows.append(
+                {
+                    "user_id": 1,
+                    "property_value": pv,
+                    "down_payment_percentage": dp,
+                    "contract_years": years,
+                    **values,
+                }
+            )
+        conn.execute(insert(models.Simulation), rows)
+
+    checkpoint = str(tmp_path / "backfill.json")
+    paused = run_backfill(
+        engine, checkpoint, chunk_size=3, rows_per_second=0, max_chunks=2
+    )
+    assert not paused["completed"] and paused["rows_scanned"] == 6
+    assert json.loads(open(checkpoint).read())["last_id"] == paused["last_id"]
+
+    done = run_backfill(engine, checkpoint, chunk_size=3, rows_per_second=0)
+    assert done["completed"]
+    assert done["run_rows_scanned"] == 4
+    assert done["rows_scanned"] == 10 and done["rows_updated"] == 4
+
+    with engine.connect() as conn:
+        stored = conn.execute(
+            select(models.Simulation).order_by(models.Simulation.id)
+        ).all()
+    for row, (pv, dp, years) in zip(stored, inputs):
+        expected = SimulationService.calculate_simulation_values(pv, dp, years)
+        assert {name: getattr(row, name) for name in expected} == expected
+
+    # Nothing left to do, and nothing rewritten on a fresh pass either
+    assert run_backfill(engine, checkpoint)["rows_updated"] == 4
+    rerun = run_backfill(engine, checkpoint, rows_per_second=0, restart=True)
+    assert rerun["rows_updated"] == 0
+    engine.dispose()
+
+
+def seed_aged_simulations(engine, ages_in_days: list[int]) -> list[int]:
+    """One user with a simulation per age, plus a seeded statistics rollup."""
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(models.User).values(email="archive@example.com", hashed_password="x")
+        )
+        rows = SimulationService.derive_rows(
+            [
+                schemas.SimulationCreate(
+                    property_value=100000 + days,
+                    down_payment_percentage=10,
+                    contract_years=20,
+                )
+                for days in ages_in_days
+            ]
+        )
+        for row, days in zip(rows, ages_in_days):
+            row.update(user_id=1, created_at=now - timedelta(days=days))
+        conn.execute(insert(models.Simulation), rows)
+        conn.execute(
+            insert(models.SimulationStats).values(
+                user_id=1,
+                simulation_count=len(rows),
+                total_property_value=sum(row["property_value"] for row in rows),
+                total_down_payment_percentage=10 * len(rows),
+                total_contract_years=20 * len(rows),
+            )
+        )
+    return [100000 + days for days in ages_in_days]
+
+
+def test_archival_moves_cold_rows_to_archive_table(monkeypatch):
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", True)
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    seed_aged_simulations(engine, [1, 400, 10, 800, 900, 30])
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=365)
+    assert archive_simulations(engine, cutoff, batch_size=2) == {"simulations": 3}
+    assert archive_simulations(engine, cutoff, batch_size=2) == {"simulations": 0}
+
+    with engine.connect() as conn:
+        hot = conn.scalars(select(models.Simulation.property_value)).all()
+        archived = conn.execute(select(models.SimulationArchive)).all()
+        stats = conn.execute(select(models.SimulationStats)).one()
+    assert sorted(hot) == [100001, 100010, 100030]
+    assert sorted(row.property_value for row in archived) == [100400, 100800, 100900]
+    assert all(row.total_to_save == row.property_value * 0.15 for row in archived)
+    assert stats.simulation_count == 3
+    assert stats.total_property_value == sum(hot)
+    assert stats.total_contract_years == 60
+    engine.dispose()
+
+
+def test_stale_rollups_are_left_alone_then_rebuilt(monkeypatch):
+    # With the flag off archival leaves the (now unmaintained) rollup alone...
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", False)
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    seed_aged_simulations(engine, [1, 400, 10])
+    cutoff = datetime.now(timezone.utc) - timedelta(days=365)
+    archive_simulations(engine, cutoff, batch_size=2)
+    with engine.connect() as conn:
+        assert conn.execute(select(models.SimulationStats)).one().simulation_count == 3
+
+    # ...and the rebuild replaces it with the totals of what is left
+    assert rebuild_stats(engine) == 1
+    with engine.connect() as conn:
+        stats = conn.execute(select(models.SimulationStats)).one()
+    assert stats.simulation_count == 2
+    assert stats.total_property_value == 100001 + 100010
+    assert stats.total_contract_years == 40
+    engine.dispose()
+
+
+def test_archival_to_file_writes_ndjson(tmp_path):
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    seed_aged_simulations(engine, [5, 500, 600])
+    cutoff = datetime.now(timezone.utc) - timedelta(days=365)
+    archive_simulations(engine, cutoff, batch_size=1, archive_dir=str(tmp_path))
+
+    # One complete gzip file per batch, nothing left half-written
+    paths = sorted(tmp_path.iterdir())
+    assert [path.suffixes for path in paths] == [[".ndjson", ".gz"]] * 2
+    lines = []
+    for path in paths:
+        with gzip.open(path, "rt") as f:
+            lines.extend(json.loads(line) for line in f)
+    assert sorted(line["property_value"] for line in lines) == [100500, 100600]
+    assert set(lines[0]) == set(ARCHIVE_COLUMNS)
+    with engine.connect() as conn:
+        assert (
+            conn.scalar(select(func.count()).select_from(models.SimulationArchive)) == 0
+        )
+        assert conn.scalars(select(models.Simulation.property_value)).all() == [100005]
+    engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_repository_statements_always_filter_on_user_id(db_session):
+    # What lets PostgreSQL prune the hash-partitioned table to one partition
+    user = await create_user(db_session)
+    with assert_max_queries(100) as budget:
+        sim = await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=200000, down_payment_percentage=10, contract_years=20
+            ),
+            user.id,
+        )
+        await SimulationService.get_simulation(db_session, sim.id, user.id)
+        await SimulationService.get_user_simulations(db_session, user.id)
+        await SimulationService.update_simulation(
+            db_session, sim.id, schemas.SimulationUpdate(contract_years=25), user.id
+        )
+        await SimulationService.batch_update(
+            db_session,
+            schemas.SimulationBatchUpdate(updates=[{"id": sim.id, "notes": "batch"}]),
+            user.id,
+        )
+        await SimulationService.get_simulation_statistics(db_session, user.id)
+        await SimulationService.delete_simulation(db_session, sim.id, user.id)
+
+    statements = [
+        sql for sql in budget.statements if re.search(r"\bsimulations\b", sql)
+    ]
+    assert statements
+    for sql in statements:
+        assert "user_id" in sql.split("WHERE", 1)[-1] or sql.startswith("INSERT"), sql
+
+
+@pytest.mark.asyncio
+async def test_statistics_rollup_matches_aggregate(db_session, monkeypatch):
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", True)
+    user = await create_user(db_session)
+    sims = [
+        await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=pv, down_payment_percentage=dp, contract_years=y
+            ),
+            user.id,
+        )
+        for pv, dp, y in [(100000, 10, 10), (250000, 20, 20), (400000, 30, 30)]
+    ]
+    await SimulationService.update_simulation(
+        db_session,
+        sims[0].id,
+        schemas.SimulationUpdate(property_value=150000, contract_years=15),
+        user.id,
+    )
+    await SimulationService.delete_simulation(db_session, sims[2].id, user.id)
+
+    rollup = await db_session.get(
+        models.SimulationStats, user.id, populate_existing=True
+    )
+    assert rollup.simulation_count == 2
+
+    stats = await SimulationService.get_simulation_statistics(db_session, user.id)
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", False)
+    after = await SimulationService.get_simulation_statistics(db_session, user.id)
+    assert after == stats
+    assert stats == {
+        "total_simulations": 2,
+        "total_property_value": 400000.0,
+        "average_down_payment_percentage": 15.0,
+        "average_contract_years": 17.5,
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_update_and_delete_are_set_based_and_scoped(
+    db_session, monkeypatch
+):
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", True)
+    user = await create_user(db_session)
+    other = models.User(email="other@example.com", name=None, hashed_password="hash")
+    db_session.add(other)
+    await db_session.commit()
+    sims = [
+        await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=pv, down_payment_percentage=10, contract_years=20
+            ),
+            user.id,
+        )
+        for pv in (100000, 200000, 300000)
+    ]
+    foreign = await SimulationService.create_simulation(
+        db_session,
+        schemas.SimulationCreate(
+            property_value=500000, down_payment_percentage=10, contract_years=20
+        ),
+        other.id,
+    )
+
+    batch = schemas.SimulationBatchUpdate(
+        updates=[
+            {"id": sims[0].id, "property_value": 150000},
+            {"id": sims[1].id, "notes": "only notes"},
+            {"id": foreign.id, "property_value": 1},
+        ]
+    )
+    # Locking read of the current inputs, one executemany UPDATE per set of
+    # columns sent, rollup UPDATE
+    with assert_max_queries(4) as budget:
+        result = await SimulationService.batch_update(db_session, batch, user.id)
+    assert result["processed"] == 2 and result["not_found"] == 1
+    # Fields an item did not send are never written back
+    notes_update = next(sql for sql in budget.statements if "SET notes" in sql)
+    assert "property_value" not in notes_update.split("WHERE")[0]
+    assert [r["status"] for r in result["results"]] == [
+        "updated",
+        "updated",
+        "not_found",
+    ]
+
+    first = await SimulationService.get_simulation(db_session, sims[0].id, user.id)
+    assert first.property_value == 150000
+    assert first.down_payment_amount == 15000.0
+    expected = SimulationService.calculate_simulation_values(150000, 10, 20)
+    assert first.monthly_savings == expected["monthly_savings"]
+    second = await SimulationService.get_simulation(db_session, sims[1].id, user.id)
+    assert second.notes == "only notes" and second.down_payment_amount == 20000.0
+    untouched = await SimulationService.get_simulation(db_session, foreign.id, other.id)
+    assert untouched.property_value == 500000
+
+    with assert_max_queries(2):
+        result = await SimulationService.batch_delete(
+            db_session,
+            schemas.SimulationBatchDelete(ids=[sims[2].id, foreign.id, sims[2].id]),
+            user.id,
+        )
+    assert result["results"] == [
+        {"id": sims[2].id, "status": "deleted"},
+        {"id": foreign.id, "status": "not_found"},
+    ]
+    with pytest.raises(HTTPException):
+        await SimulationService.get_simulation(db_session, sims[2].id, user.id)
+    kept = await SimulationService.get_simulation(db_session, foreign.id, other.id)
+    assert kept.id == foreign.id
+
+    stats = await SimulationService.get_simulation_statistics(db_session, user.id)
+    monkeypatch.setattr(simulation_crud, "STATS_ROLLUP_ENABLED", False)
+    assert (
+        await SimulationService.get_simulation_statistics(db_session, user.id) == stats
+    )
+    assert stats["total_simulations"] == 2 and stats["total_property_value"] == 350000.0
+
+
+def test_batch_update_rejects_duplicate_ids_and_null_inputs():
+    with pytest.raises(ValueError):
+        schemas.SimulationBatchUpdate(
+            updates=[{"id": 1, "notes": "a"}, {"id": 1, "notes": "b"}]
+        )
+    with pytest.raises(ValueError):
+        schemas.SimulationBatchUpdate(updates=[{"id": 1, "property_value": None}])
+    item = schemas.SimulationBatchUpdate(updates=[{"id": 1, "notes": None}]).updates[0]
+    assert item.model_dump(exclude_unset=True) == {"id": 1, "notes": None}
+
+
+@pytest.mark.asyncio
+async def test_import_csv_reports_bad_rows_and_keeps_good_ones(db_session, monkeypatch):
+    monkeypatch.setattr(simulation_services, "IMPORT_CHUNK_SIZE", 2)
+    user = await create_user(db_session)
+    upload = io.BytesIO(
+        b"property_value,down_payment_percentage,contract_years,notes\n"
+        b"500000,20,30,first\n"
+        b"-1,20,30,negative\n"
+        b"250000,10,10,\n"
+        b"300000,abc,15,bad percentage\n"
+        b"400000,25,20,\"multi\nline\"\n"
+    )
+
+    result = await SimulationService.import_simulations(
+        db_session, user.id, upload, "csv"
+    )
 
+    assert result["imported"] == 3
+    assert result["failed"] == 2
+    assert [error["line"] for error in result["errors"]] == [3, 5]
+    assert not result["errors_truncated"]
 
+    sims, total, _ = await SimulationService.get_user_simulations(db_session, user.id)
+    assert total == 3
+    by_value = {sim.property_value: sim for sim in sims}
+    assert by_value[500000].monthly_savings == 208.33
+    assert by_value[250000].notes is None
+    assert by_value[400000].notes == "multi\nline"
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson(db_session):
+    user = await create_user(db_session)
+    upload = io.BytesIO(
+        b'{"property_value": 500000, "down_payment_percentage": 20, '
+        b'"contract_years": 30}\n'
+        b"\n"
+        b"not json\n"
+        b"[1, 2]\n"
+    )
+
+    result = await SimulationService.import_simulations(
+        db_session, user.id, upload, "ndjson"
+    )
+
+    assert result["imported"] == 1
+    assert [error["line"] for error in result["errors"]] == [3, 4]
+
+
+@pytest.mark.asyncio
+async def test_export_streams_csv_and_ndjson(db_session):
+    user = await create_user(db_session)
+    for value in (100000, 200000):
+        await SimulationService.create_simulation(
+            db_session,
+            schemas.SimulationCreate(
+                property_value=value,
+                down_payment_percentage=10,
+                contract_years=10,
+                notes="a,b",
+            ),
+            user.id,
+        )
+
+    chunks = [
+        chunk
+        async for chunk in SimulationService.export_simulations(
+            db_session, user.id, "csv"
+        )
+    ]
+    lines = "".join(chunks).splitlines()
+    assert lines[0].startswith("id,property_value,down_payment_percentage")
+    assert len(lines) == 3
+    assert '"a,b"' in lines[1]
+
+    body = "".join(
+        [
+            chunk
+            async for chunk in SimulationService.export_simulations(
+                db_session, user.id, "ndjson"
+            )
+        ]
+    )
+    rows = [json.loads(line) for line in body.splitlines()]
+    assert [row["property_value"] for row in rows] == [100000, 200000]
+    assert rows[0]["monthly_savings"] == 125.0
+
+
+def test_amortization_schedules_repay_principal():
+    # 12.682503% a year is exactly 1% a month
+    schedule = amortization_schedule(
+        [100000, 120000], 12.682503013197, [12, 24], "price"
+    )
+    assert schedule["payment"].shape == (2, 24)
+    assert round(schedule["payment"][0, 0], 2) == 8884.88
+    assert (schedule["payment"][0, 12:] == 0).all()
+    assert schedule["amortization"].sum(axis=1).round(6).tolist() == [100000, 120000]
+    assert schedule["balance"][:, -1].tolist() == [0, 0]
+
+    sac = amortization_schedule(120000, 12.682503013197, 24, "sac")
+    assert sac["amortization"][0].round(6).tolist() == [5000] * 24
+    assert sac["payment"][0, :2].round(2).tolist() == [6200.0, 6150.0]
+
+    no_interest = amortization_schedule(1200, 0, 12, "price")
+    assert no_interest["payment"][0].tolist() == [100.0] * 12
+
+
+@pytest.mark.asyncio
+async def test_schedule_endpoint_service_aggregates_and_caches(db_session):
+    schedule_cache.clear()
+    user = await create_user(db_session)
+    sim = await SimulationService.create_simulation(
+        db_session,
+        schemas.SimulationCreate(
+            property_value=150000, down_payment_percentage=20, contract_years=2
+        ),
+        user.id,
+    )
+
+    yearly = await SimulationService.get_amortization_schedule(
+        db_session, sim.id, user.id, "sac", 12.682503013197, "year"
+    )
+    assert yearly["periods"] == 2
+    assert yearly["amortization"] == [60000.0, 60000.0]
+    assert yearly["balance"] == [60000.0, 0.0]
+    assert yearly["payment"] == [71100.0, 63900.0]
+
+    again = await SimulationService.get_amortization_schedule(
+        db_session, sim.id, user.id, "sac", 12.682503013197, "year"
+    )
+    assert again is yearly
+    assert schedule_cache.hits == 1
+
+    await SimulationService.update_simulation(
+        db_session, sim.id, schemas.SimulationUpdate(contract_years=3), user.id
+    )
+    updated = await SimulationService.get_amortization_schedule(
+        db_session, sim.id, user.id, "sac", 12.682503013197, "year"
+    )
+    assert updated["periods"] == 3
+
+
+def test_sweep_streams_in_chunks_matching_grid():
+    sweep = schemas.SimulationSweep(
+        property_value={"start": 100000, "stop": 1000000, "step": 100000},
+        down_payment_percentage={"start": 0, "stop": 50, "step": 12.5},
+        contract_years={"start": 1, "stop": 30},
+    )
+    axes = SimulationService.sweep_axes(sweep)
+    grid = SimulationService.sweep_grid(axes)
+    assert grid["shape"] == [10, 5, 30]
+
+    lines = [
+        json.loads(line) for line in SimulationService.stream_sweep(axes, chunk_size=64)
+    ]
+    assert lines[0]["count"] == grid["count"] == 1500
+    assert [line["offset"] for line in lines[1:]] == list(range(0, 1500, 64))
+    streamed = {
+        name: [value for line in lines[1:] for value in line["calculated_values"][name]]
+        for name in grid["calculated_values"]
+    }
+    assert streamed == grid["calculated_values"]
+
+
+MONTE_CARLO_PARAMS = {
+    "months": 120,
+    "financing_amount": 400000.0,
+    "monthly_savings": 625.0,
+    "total_to_save": 75000.0,
+    "annual_interest_rate": 10.0,
+    "long_run_interest_rate": 10.0,
+    "interest_rate_volatility": 2.0,
+    "mean_reversion": 0.3,
+    "monthly_income": 15000.0,
+    "income_growth": 0.03,
+    "income_volatility": 0.1,
+    "correlation": 0.2,
+    "affordability_threshold": 30.0,
+}
+
+
+def test_monte_carlo_is_reproducible_across_executors(monkeypatch):
+    monkeypatch.setattr(montecarlo, "MONTECARLO_WORKERS", 2)
+    paths = montecarlo.BLOCK_PATHS * 2 + 100
+    inline = montecarlo.run_paths(MONTE_CARLO_PARAMS, paths, seed=42)
+    executor = montecarlo.get_executor()
+    try:
+        # Workers are spawned, never forked from the threaded server process
+        assert executor._mp_context.get_start_method() == "spawn"
+        parallel = montecarlo.run_paths(
+            MONTE_CARLO_PARAMS, paths, seed=42, executor=executor
+        )
+    finally:
+        montecarlo.shutdown_executor()
+    for name, values in inline.items():
+        assert values.shape[0] == paths
+        np.testing.assert_array_equal(values, parallel[name])
+
+    other = montecarlo.run_paths(MONTE_CARLO_PARAMS, paths, seed=43)
+    assert not np.array_equal(inline["payment"], other["payment"])
+
+
+def test_monte_carlo_without_volatility_matches_price_schedule():
+    params = {
+        **MONTE_CARLO_PARAMS,
+        "interest_rate_volatility": 0.0,
+        "income_volatility": 0.0,
+    }
+    outputs = montecarlo.run_paths(params, 100, seed=1)
+    schedule = amortization_schedule(400000.0, 10.0, 120, "price")
+    np.testing.assert_allclose(outputs["payment"][0], schedule["payment"][0][11::12])
+    np.testing.assert_allclose(
+        outputs["balance"][0], schedule["balance"][0][11::12], atol=1e-6
+    )
+
+
+@pytest.mark.asyncio
+async def test_monte_carlo_service_returns_percentile_bands(db_session):
+    user = await create_user(db_session)
+    sim = await SimulationService.create_simulation(
+        db_session,
+        schemas.SimulationCreate(
+            property_value=500000, down_payment_percentage=20, contract_years=10
+        ),
+        user.id,
+    )
+    request = schemas.MonteCarloRequest(
+        paths=500, seed=7, annual_interest_rate=10, monthly_income=15000
+    )
+    result = await SimulationService.run_monte_carlo(
+        db_session, sim.id, user.id, request
+    )
+    assert result["seed"] == 7
+    assert result["years"] == list(range(1, 11))
+    payment = result["bands"]["payment"]
+    assert list(payment) == ["p5", "p25", "p50", "p75", "p95"]
+    assert all(len(band) == 10 for band in payment.values())
+    assert all(low <= high for low, high in zip(payment["p5"], payment["p95"]))
+    assert result["bands"]["balance"]["p50"][-1] == 0.0
+    assert 0 <= result["probability_unaffordable"] <= 1
+
+    again = await SimulationService.run_monte_carlo(
+        db_session, sim.id, user.id, request
+    )
+    assert again == result
+
+    with pytest.raises(HTTPException):
+        await SimulationService.run_monte_carlo(
+            db_session, sim.id + 1, user.id, request
+        )